@@ -1,20 +1,31 @@
 from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 import os
 from db import db, init_db
 from routes import bp
+from query_budget import init_query_budget
+from metrics import init_metrics
+from commands import register_commands
 
 load_dotenv()
 app = Flask(__name__)
-CORS(app)
+# TLS ends at the hosting proxy; trust its X-Forwarded-Proto so
+# request.host_url is https. X-Forwarded-Host is not trusted: clients can
+# send it, and it would end up in the flag URLs the API returns
+app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1)
+CORS(app, expose_headers=["X-Total-Count"])
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 app.config['SESSION_COOKIE_SECURE'] = True
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 
 init_db(app)
+init_query_budget(app)
+init_metrics(app)
 app.register_blueprint(bp)
+register_commands(app)
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""Benchmark the scoring paths and ranking endpoints on synthetic datasets.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/path_bench \
+        python bench.py --scales small,medium --repeat 5 --output bench.json --reset
+
+Each scale wipes the target database and refills it with synthetic.generate,
+so --reset is required.
+Every case reports wall time (median/p95/min/max), SQL queries per run and
+peak Python memory (tracemalloc) as JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import synthetic
+
+SCALES = {
+    "small": {"countries": 30, "universities": 1000, "groups": 6, "metrics_per_group": 5},
+    "medium": {"countries": 60, "universities": 10000, "groups": 12, "metrics_per_group": 10},
+    "large": {"countries": 200, "universities": 50000, "groups": 20, "metrics_per_group": 10},
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(fn, repeat, counter, setup=None):
+    """Run ``fn`` ``repeat`` times; memory is traced on the first run only."""
+    times, queries, peak = [], [], None
+    for run in range(repeat):
+        if setup:
+            setup()
+        trace = run == 0
+        if trace:
+            tracemalloc.start()
+        before = counter.count
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+        queries.append(counter.count - before)
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(times), 3),
+        "p95_ms": round(percentile(times, 95), 3),
+        "min_ms": round(min(times), 3),
+        "max_ms": round(max(times), 3),
+        "queries": max(queries),
+        "peak_memory_bytes": peak,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_cases(app, repeat, counter):
+    import scoring
+    import utils
+    from ranking_cache import ranking_cache
+    from scoring import COUNTRY, UNIVERSITY, ScoringEngine
+
+    client = app.test_client()
+
+    def cold():
+        scoring.invalidate()
+        ranking_cache.clear()
+
+    def load(kind, sql_normalize=False):
+        previous = scoring.SQL_NORMALIZE
+        scoring.SQL_NORMALIZE = sql_normalize
+        try:
+            return ScoringEngine.load(kind)
+        finally:
+            scoring.SQL_NORMALIZE = previous
+
+    def get(path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+        return response.get_data()
+
+    results = {}
+    for kind in (COUNTRY, UNIVERSITY):
+        results[f"{kind}.engine_load"] = measure(lambda: load(kind), repeat, counter)
+        results[f"{kind}.engine_load_sql_normalize"] = measure(lambda: load(kind, True), repeat, counter)
+
+        engine = load(kind)
+        weights = {gid: 1.0 for gid in engine.group_ids}
+        results[f"{kind}.score"] = measure(lambda: engine.score(weights, []), repeat, counter)
+        ranking = engine.score(weights, [])
+        results[f"{kind}.serialize_full"] = measure(lambda: ranking.results(), repeat, counter)
+        results[f"{kind}.serialize_top50_summary"] = measure(
+            lambda: ranking.results(limit=50, fields="summary"), repeat, counter
+        )
+
+        # JSON encoding of the full ranking: result dicts + json.dumps (what
+        # jsonify did) against the streamed fragment path the routes use
+        per_10k = 10000 / max(len(ranking), 1)
+        for name, fn in (
+            ("json_dicts", lambda: json.dumps(ranking.results(), sort_keys=True, separators=(",", ":"))),
+            ("json_stream", lambda: b"".join(ranking.json_chunks())),
+        ):
+            case = measure(fn, repeat, counter)
+            case["median_ms_per_10k"] = round(case["median_ms"] * per_10k, 3)
+            results[f"{kind}.serialize_{name}"] = case
+
+    results["calculate_country_scores.cold"] = measure(
+        lambda: utils.calculate_country_scores({}), repeat, counter, setup=cold
+    )
+    results["calculate_university_scores.cold"] = measure(
+        lambda: utils.calculate_university_scores({}), repeat, counter, setup=cold
+    )
+    results["calculate_university_scores.warm"] = measure(
+        lambda: utils.calculate_university_scores({}), repeat, counter
+    )
+
+    endpoints = [
+        "/api/country-rankings",
+        "/api/university-rankings",
+        "/api/university-rankings?limit=50&fields=summary",
+        "/api/get-universities?flags=url",
+        "/api/uni-disciplines",
+    ]
+    for path in endpoints:
+        results[f"GET {path} (cold)"] = measure(lambda: get(path), repeat, counter, setup=cold)
+        results[f"GET {path}"] = measure(lambda: get(path), repeat, counter)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scoring paths on synthetic data.")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument(
+        "--scales", default="small,medium",
+        help=f"Comma-separated presets ({', '.join(SCALES)}) or countries:universities:groups:metrics_per_group.",
+    )
+    parser.add_argument("--sparsity", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    parser.add_argument("--reset", action="store_true", help="Required: each scale drops and recreates every table.")
+    return parser.parse_args(argv)
+
+
+def scale_params(name):
+    if name in SCALES:
+        return dict(SCALES[name])
+    try:
+        countries, universities, groups, metrics_per_group = (int(v) for v in name.split(":"))
+    except ValueError:
+        sys.exit(f"Unknown scale {name!r}")
+    return {
+        "countries": countries,
+        "universities": universities,
+        "groups": groups,
+        "metrics_per_group": metrics_per_group,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.reset:
+        sys.exit("Refusing to run without --reset: each scale drops every table in the target database.")
+    synthetic.use_database(args.database_url)
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from app import app
+
+    counter = QueryCounter()
+    event.listen(Engine, "before_cursor_execute", counter)
+
+    report = {
+        "git_commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "scales": [],
+    }
+    for name in args.scales.split(","):
+        params = scale_params(name.strip())
+        with app.app_context():
+            start = time.perf_counter()
+            dataset = synthetic.generate(sparsity=args.sparsity, seed=args.seed, **params)
+            generate_s = round(time.perf_counter() - start, 3)
+            print(f"{name}: generated {dataset} in {generate_s}s", file=sys.stderr)
+            results = run_cases(app, args.repeat, counter)
+        report["scales"].append({
+            "name": name,
+            "dataset": dataset,
+            "generate_seconds": generate_s,
+            "results": results,
+        })
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
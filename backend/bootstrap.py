@@ -0,0 +1,74 @@
+import hashlib
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from models import db, Country, University, MetricGroup, CountryIndustry, CountryDisciplines, UniversityDisciplines
+from scoring import dumps
+
+# How often a request re-checks the source tables for a new dataset version
+BOOTSTRAP_CHECK_SECONDS = float(os.getenv("BOOTSTRAP_CHECK_SECONDS", "30"))
+# Bundles are rebuilt at least this often, so edits that keep row counts
+# (a renamed country, a new flag) still show up
+BOOTSTRAP_REBUILD_SECONDS = float(os.getenv("BOOTSTRAP_REBUILD_SECONDS", "3600"))
+# Browser cache lifetime; afterwards the ETag (the bundle version) makes
+# revalidation a 304 until the data changes
+BOOTSTRAP_MAX_AGE = int(os.getenv("BOOTSTRAP_MAX_AGE", "3600"))
+BOOTSTRAP_STALE_SECONDS = int(os.getenv("BOOTSTRAP_STALE_SECONDS", "86400"))
+
+_SOURCES = (Country, University, MetricGroup, CountryIndustry, CountryDisciplines, UniversityDisciplines)
+
+
+class Bundle:
+    def __init__(self, version, body, source, built_at):
+        self.version = version
+        self.body = body
+        self.source = source
+        self.built_at = built_at
+        self.checked_at = built_at
+
+
+_bundles = {}
+_lock = threading.Lock()
+
+
+def source_fingerprint():
+    """Cheap version of the reference tables: row count and max id of each, in one query."""
+    columns = []
+    for model in _SOURCES:
+        columns.append(select(func.count(model.id)).scalar_subquery())
+        columns.append(select(func.coalesce(func.max(model.id), 0)).scalar_subquery())
+    row = db.session.execute(select(*columns)).one()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:16]
+
+
+def get_bundle(page, build):
+    """Serialized reference data for ``page``, rebuilt only when the source tables change.
+
+    ``build`` returns the dict of sections. The bundle's version is a hash of
+    its body, so it only changes when the payload does.
+    """
+    with _lock:
+        bundle = _bundles.get(page)
+        now = time.monotonic()
+        if bundle and now - bundle.checked_at < BOOTSTRAP_CHECK_SECONDS:
+            return bundle
+
+        source = source_fingerprint()
+        if bundle and bundle.source == source and now - bundle.built_at < BOOTSTRAP_REBUILD_SECONDS:
+            bundle.checked_at = now
+            return bundle
+
+        sections = build()
+        version = hashlib.sha1(dumps(sections).encode()).hexdigest()[:16]
+        if bundle and bundle.version == version:
+            bundle.source, bundle.built_at, bundle.checked_at = source, now, now
+            return bundle
+
+        bundle = Bundle(version, dumps({"version": version, **sections}).encode(), source, now)
+        _bundles[page] = bundle
+        current_app.logger.info("Built %s bootstrap bundle %s (%d bytes)", page, version, len(bundle.body))
+        return bundle
@@ -0,0 +1,238 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+
+import citation_cache
+import norry
+from models import db, Country, University, CountryDetails, UniversityDetails
+
+COUNTRY = "country"
+UNIVERSITY = "university"
+
+# Stored Nori cards younger than this are served without calling upstream;
+# older ones are still served, but trigger a background refresh
+CARD_TTL = timedelta(hours=float(os.getenv("NORI_CARD_TTL_HOURS", "24")))
+EXPECTED_CARDS = 6
+# How long a worker waits for another worker's in-flight fetch of the same name
+LOCK_TIMEOUT = float(os.getenv("NORI_LOCK_TIMEOUT_SECONDS", "30"))
+# Background refreshes of stale cards: worker threads, and how many names may
+# be queued or running before further stale hits skip the refresh
+REFRESH_WORKERS = int(os.getenv("NORI_REFRESH_WORKERS", "4"))
+REFRESH_MAX_PENDING = int(os.getenv("NORI_REFRESH_MAX_PENDING", "100"))
+
+KINDS = {
+    COUNTRY: {
+        "model": Country,
+        "details": CountryDetails,
+        "fetch": "get_country_info",
+        "id_field": "country_id",
+        "name_field": "country_name",
+    },
+    UNIVERSITY: {
+        "model": University,
+        "details": UniversityDetails,
+        "fetch": "get_uni_info",
+        "id_field": "uni_id",
+        "name_field": "uni_name",
+    },
+}
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+_refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="nori-refresh")
+
+
+def find_record(kind, name):
+    model = KINDS[kind]["model"]
+    return model.query.options(joinedload(model.details)).filter(model.name.ilike(name)).first()
+
+
+def is_fresh(details, now=None):
+    if not details or not details.cards or not details.fetch_date:
+        return False
+    return (now or datetime.now()) - details.fetch_date < CARD_TTL
+
+
+def citation_urls(citations):
+    """Bare URLs of ``citations``, which may already be enriched dicts."""
+    return [c["url"] if isinstance(c, dict) else c for c in citations or []]
+
+
+def stored_citations(details, enrich=True):
+    """Citations saved with the cards.
+
+    Enriched titles and dates come from the citation cache only, so a cache
+    hit never calls upstream; unknown URLs come back without them.
+    """
+    urls = list(details.citations or []) if details else []
+    if not enrich:
+        return urls
+    cached = citation_cache.lookup(urls)
+    return [dict(cached.get(url) or {"url": url, "title": None, "date": None}) for url in urls]
+
+
+def store_cards(kind, record, name, cards, citations=None):
+    spec = KINDS[kind]
+    urls = citation_urls(citations)
+    try:
+        if record.details:
+            record.details.cards = cards
+            record.details.citations = urls
+            record.details.fetch_date = datetime.now()
+        else:
+            record.details = spec["details"](**{
+                spec["id_field"]: record.id,
+                spec["name_field"]: name,
+                "cards": cards,
+                "citations": urls,
+                "fetch_date": datetime.now(),
+            })
+        db.session.commit()
+    except Exception as db_error:
+        db.session.rollback()
+        print(f"⚠️ Database update failed for {name}: {str(db_error)}")
+
+
+def request_cards(kind, name, enrich=True):
+    """Call Nori for ``name``; returns (cards, citations), or None if the card set is incomplete.
+
+    With ``enrich=False`` the citations are the bare URLs, to be passed to
+    ``norry.enrich_citations`` by the caller.
+    """
+    cards_obj, citations = getattr(norry, KINDS[kind]["fetch"])(name, enrich=enrich)
+    cards = cards_obj.get("cards", []) if cards_obj else []
+    print("Live cards:", cards)
+    print("Citations:", citations)
+
+    if len(cards) != EXPECTED_CARDS:
+        print(f"⚠️ Live API returned {len(cards)} cards (expected {EXPECTED_CARDS})")
+        return None
+    return cards, citations
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers wait for and share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+        return call["result"]
+
+
+_flights = SingleFlight()
+
+
+def flight_key(kind, name):
+    return kind, " ".join(name.lower().split())
+
+
+def _advisory_key(key):
+    digest = hashlib.sha1(f"nori:{key[0]}:{key[1]}".encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def fetch_live(kind, name, record=None, enrich=True):
+    """Like ``request_cards``, but also stores the cards on the matching row.
+
+    Concurrent calls for the same name share one upstream request: threads in
+    this worker through ``SingleFlight``, other workers through a Postgres
+    advisory lock held until the cards are committed.
+    """
+    key = flight_key(kind, name)
+    return _flights.do(key + (enrich,), lambda: _fetch_live_locked(kind, name, record, key, enrich))
+
+
+def _fetch_live_locked(kind, name, record, key, enrich):
+    if db.engine.dialect.name != "postgresql":
+        return _fetch_live(kind, name, record, enrich)
+
+    lock_key = _advisory_key(key)
+    try:
+        # lock_timeout is set in the same round trip; it bounds the wait below
+        acquired = db.session.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key) FROM set_config('lock_timeout', :timeout, true)"),
+            {"key": lock_key, "timeout": f"{int(LOCK_TIMEOUT * 1000)}ms"},
+        ).scalar()
+        if not acquired:
+            # Another worker is already fetching: wait for its commit and reuse
+            # the stored cards
+            db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": lock_key})
+            db.session.rollback()
+            record = find_record(kind, name)
+            if record and is_fresh(record.details):
+                return record.details.cards, stored_citations(record.details, enrich)
+    except OperationalError as lock_error:
+        db.session.rollback()
+        print(f"⚠️ Waiting for another worker's fetch of {name} failed: {str(lock_error)}")
+
+    try:
+        return _fetch_live(kind, name, record, enrich)
+    finally:
+        # Ends the transaction holding the advisory lock if nothing committed it
+        db.session.rollback()
+
+
+def _fetch_live(kind, name, record=None, enrich=True):
+    live = request_cards(kind, name, enrich)
+    if live is None:
+        return None
+
+    cards, citations = live
+    record = record or find_record(kind, name)
+    if record:
+        store_cards(kind, record, name, cards, citations)
+    return cards, citations
+
+
+def refresh_in_background(kind, name):
+    key = flight_key(kind, name)
+    with _refreshing_lock:
+        if key in _refreshing or len(_refreshing) >= REFRESH_MAX_PENDING:
+            return False
+        _refreshing.add(key)
+
+    app = current_app._get_current_object()
+
+    def run():
+        try:
+            with app.app_context():
+                # Only the citation URLs are stored, so skip enriching them
+                fetch_live(kind, name, enrich=False)
+        except Exception as e:
+            print(f"❌ Background refresh failed for {name}: {str(e)}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresh_executor.submit(run)
+    return True
@@ -0,0 +1,74 @@
+import os
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from models import db, CitationMetadata
+
+# How long a looked-up title/date is reused before the URL is searched again
+CITATION_TTL = timedelta(days=float(os.getenv("CITATION_CACHE_TTL_DAYS", "30")))
+
+
+def lookup(urls):
+    """Fresh cached entries for ``urls`` in one query, as {url: {"url", "title", "date"}}."""
+    if not urls or not has_app_context():
+        return {}
+
+    table = CitationMetadata.__table__
+    cutoff = datetime.now() - CITATION_TTL
+    try:
+        # Own connection, so this never touches the caller's transaction
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.url, table.c.title, table.c.date)
+                .where(table.c.url.in_(set(urls)), table.c.fetched_at >= cutoff)
+            ).fetchall()
+    except Exception as e:
+        print(f"⚠️ Citation cache lookup failed: {e}")
+        return {}
+
+    return {row.url: {"url": row.url, "title": row.title, "date": row.date} for row in rows}
+
+
+def store(citations):
+    if not citations or not has_app_context():
+        return
+
+    now = datetime.now()
+    rows = {
+        c["url"]: {"url": c["url"], "title": c.get("title"), "date": c.get("date"), "fetched_at": now}
+        for c in citations
+    }
+    stmt = insert(CitationMetadata.__table__).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["url"],
+        set_={
+            "title": stmt.excluded.title,
+            "date": stmt.excluded.date,
+            "fetched_at": stmt.excluded.fetched_at,
+        },
+    )
+    try:
+        # A separate transaction: committing on the request session would end
+        # the card fetch's advisory lock early
+        with db.engine.begin() as conn:
+            conn.execute(stmt)
+    except Exception as e:
+        print(f"⚠️ Citation cache write failed: {e}")
+
+
+def store_when_done(future):
+    """Cache a lookup that missed its caller's deadline once it does finish."""
+    if not has_app_context():
+        return
+    app = current_app._get_current_object()
+
+    def done(f):
+        if f.cancelled() or f.exception() is not None:
+            return
+        with app.app_context():
+            store([f.result()])
+
+    future.add_done_callback(done)
@@ -0,0 +1,149 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import click
+from sqlalchemy import or_, text
+from sqlalchemy.dialects.postgresql import insert
+
+from cards import CARD_TTL, COUNTRY, KINDS, UNIVERSITY, citation_urls, request_cards
+from models import db
+
+# Columns added to existing tables after they were first created; create_all
+# does not alter tables
+ADDED_COLUMNS = [
+    ("country_details", "citations", "JSONB"),
+    ("university_details", "citations", "JSONB"),
+]
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than ``per_minute`` start in any minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def stale_targets(kind, force=False, limit=None):
+    spec = KINDS[kind]
+    model, details = spec["model"], spec["details"]
+    id_column = getattr(details, spec["id_field"])
+
+    query = (
+        db.session.query(model.id, model.name)
+        .outerjoin(details, id_column == model.id)
+        .order_by(model.id)
+    )
+    if not force:
+        cutoff = datetime.now() - CARD_TTL
+        query = query.filter(or_(details.id.is_(None), details.fetch_date < cutoff))
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def upsert_cards(kind, rows):
+    if not rows:
+        return
+    spec = KINDS[kind]
+    table = spec["details"].__table__
+    stmt = insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[spec["id_field"]],
+        set_={
+            spec["name_field"]: stmt.excluded[spec["name_field"]],
+            "cards": stmt.excluded.cards,
+            "citations": stmt.excluded.citations,
+            "fetch_date": stmt.excluded.fetch_date,
+        },
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+
+
+def prefetch(kind, concurrency, per_minute, batch_size, force=False, limit=None):
+    spec = KINDS[kind]
+    targets = stale_targets(kind, force, limit)
+    click.echo(f"{kind}: {len(targets)} rows to refresh")
+    if not targets:
+        return 0, 0
+
+    limiter = RateLimiter(per_minute)
+
+    def work(target):
+        limiter.wait()
+        return target, request_cards(kind, target.name, enrich=False)
+
+    refreshed, failed, pending = 0, 0, []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(work, target) for target in targets]
+        for future in as_completed(futures):
+            try:
+                target, live = future.result()
+            except Exception as e:
+                failed += 1
+                click.echo(f"❌ {kind} refresh failed: {e}", err=True)
+                continue
+            if live is None:
+                failed += 1
+                click.echo(f"⚠️ {kind} {target.name}: incomplete card set, skipped", err=True)
+                continue
+
+            cards, citations = live
+            pending.append({
+                spec["id_field"]: target.id,
+                spec["name_field"]: target.name,
+                "cards": cards,
+                "citations": citation_urls(citations),
+                "fetch_date": datetime.now(),
+            })
+            if len(pending) >= batch_size:
+                upsert_cards(kind, pending)
+                refreshed += len(pending)
+                click.echo(f"{kind}: {refreshed}/{len(targets)} stored")
+                pending = []
+
+    upsert_cards(kind, pending)
+    refreshed += len(pending)
+    return refreshed, failed
+
+
+def register_commands(app):
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create any tables in models.py that do not exist yet, and add newer columns."""
+        db.create_all()
+        if db.engine.dialect.name == "postgresql":
+            for table, column, ddl in ADDED_COLUMNS:
+                db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {ddl}"))
+            db.session.commit()
+        click.echo("Tables created.")
+
+    @app.cli.command("prefetch-cards")
+    @click.option("--kind", type=click.Choice(["all", COUNTRY, UNIVERSITY]), default="all")
+    @click.option("--concurrency", default=4, show_default=True, help="Parallel upstream calls.")
+    @click.option("--rpm", default=30, show_default=True, help="Upstream requests per minute.")
+    @click.option("--batch-size", default=20, show_default=True, help="Rows per upsert.")
+    @click.option("--force", is_flag=True, help="Refresh rows that are still fresh too.")
+    @click.option("--limit", type=int, default=None, help="Only refresh this many rows per kind.")
+    def prefetch_cards(kind, concurrency, rpm, batch_size, force, limit):
+        """Refresh stored Nori cards for countries and universities.
+
+        Rows whose cards are younger than NORI_CARD_TTL_HOURS are skipped, so
+        an interrupted run picks up where it stopped.
+        """
+        kinds = [COUNTRY, UNIVERSITY] if kind == "all" else [kind]
+        for k in kinds:
+            refreshed, failed = prefetch(k, concurrency, rpm, batch_size, force, limit)
+            click.echo(f"{k}: {refreshed} refreshed, {failed} failed")
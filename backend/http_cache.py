@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+import os
+import zlib
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+# Bodies smaller than this many bytes are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+COMPRESS_MIMETYPES = {"application/json"}
+# Part of every query ETag; change it when a deploy changes response bodies
+# for the same data and query
+ETAG_SALT = os.getenv("ETAG_SALT", "")
+
+_ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def query_etag(*parts):
+    """Strong ETag for a response fully determined by ``parts`` (dataset version, normalised query)."""
+    return hashlib.sha1(repr((ETAG_SALT,) + parts).encode()).hexdigest()
+
+
+def _client_tag(etag):
+    # Compressed responses carry "<etag>-<encoding>"; any encoding of the same
+    # body counts as a match
+    for tag in request.if_none_match.as_set():
+        base = tag
+        for suffix in _ENCODING_SUFFIXES:
+            if tag.endswith(suffix):
+                base = tag[: -len(suffix)]
+                break
+        if base == etag:
+            return tag
+    return None
+
+
+def _not_modified(tag):
+    response = Response(status=304)
+    response.set_etag(tag)
+    response.cache_control.no_cache = True
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def conditional(etag, build):
+    """Return 304 if the client already has ``etag``; otherwise ``build()`` tagged with it.
+
+    ``build`` only runs on a miss, so unchanged requests skip the work.
+    """
+    tag = _client_tag(etag)
+    if tag:
+        return _not_modified(tag)
+    response = build()
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional_body(response):
+    """Like ``conditional`` for responses without a cheap version: the ETag hashes the body."""
+    etag = hashlib.sha1(response.get_data()).hexdigest()
+    tag = _client_tag(etag)
+    if tag:
+        return _not_modified(tag)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def negotiate_encoding():
+    offered = (["br"] if brotli else []) + ["gzip"]
+    best, best_quality = None, 0
+    for encoding in offered:
+        quality = request.accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compress_stream(chunks, encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        out = compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if out:
+            yield out
+    yield finish()
+
+
+def compress_response(response):
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESS_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        # Streamed bodies are the large ones, so the size threshold is skipped
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        if encoding == "br":
+            body = brotli.compress(data, quality=BROTLI_QUALITY)
+        else:
+            body = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+        response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
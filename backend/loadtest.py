@@ -0,0 +1,280 @@
+"""Concurrent HTTP load test for a running backend.
+
+Usage:
+    python loadtest.py --base-url http://localhost:5000 --concurrency 16 --duration 60
+
+Each worker loops for --duration seconds, picking a scenario by --mix weight:
+ranking requests with random group_* weights and discipline/industry filters,
+the list endpoints, and (with --stub-upstream) the Nori info endpoints. RPS,
+p50/p95/p99 latency and error rates per scenario go to stderr, and to
+--output as JSON.
+
+--stub-upstream PORT serves canned Nori responses on 127.0.0.1:PORT; start
+the app with the NORRY_URL / NORRY_SEARCH_URL it prints so /country-info and
+/uni-info never reach the real API. Info requests hit a random name each time,
+so they mostly measure the cached-card path.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+DEFAULT_MIX = {
+    "country-rankings": 30,
+    "university-rankings": 15,
+    "university-rankings-page": 25,
+    "get-countries": 5,
+    "get-universities": 5,
+    "metric-groups": 5,
+    "country-info": 8,
+    "uni-info": 7,
+}
+INFO_SCENARIOS = ("country-info", "uni-info")
+
+
+class StubNori(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.5
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.latency)
+        if self.path.startswith("/search"):
+            out = {"results": [{"title": f"Stub result for {body.get('query')}", "date": "2025-01-01"}]}
+        else:
+            cards = {
+                "cards": [
+                    {"headline": f"Stub card {i + 1}", "category": "Stub", "description": "Canned load-test card."}
+                    for i in range(6)
+                ]
+            }
+            out = {
+                "choices": [{"message": {"content": json.dumps(cards)}}],
+                "citations": ["https://example.com/a", "https://example.com/b"],
+            }
+        data = json.dumps(out).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub(port, latency):
+    StubNori.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubNori)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Catalog:
+    """Ids and names the scenarios draw random parameters from."""
+
+    def __init__(self, base_url):
+        session = requests.Session()
+
+        def get(path):
+            resp = session.get(base_url + path, timeout=60)
+            resp.raise_for_status()
+            return resp.json()
+
+        groups = get("/api/get-metric-groups")
+        self.country_groups = [g["id"] for g in groups if g["category"] in ("country", "both")]
+        self.uni_groups = [g["id"] for g in groups if g["category"] in ("uni", "both")]
+        self.countries = [c["name"] for c in get("/api/get-countries?flags=url")]
+        self.universities = [u["name"] for u in get("/api/get-universities?flags=url")]
+        self.country_disciplines = sorted({d for c in get("/api/country-disciplines") for d in c["top_disciplines"] or []})
+        self.industries = sorted({i for c in get("/api/industries") for i in c["top_dominant_sectors"] or []})
+        self.uni_disciplines = sorted({d for u in get("/api/uni-disciplines") for d in u["top_disciplines"] or []})
+
+
+def random_weights(rnd, group_ids):
+    # Mostly slider-like values, with some groups switched off
+    return {f"group_{gid}": rnd.choice([0, 0, 0.25, 0.5, 0.75, 1, round(rnd.random(), 2)]) for gid in group_ids}
+
+
+def pick(rnd, items, most=2):
+    return rnd.sample(items, rnd.randint(0, min(most, len(items)))) if items else []
+
+
+def build_request(scenario, rnd, catalog):
+    """Return (path, params) for one request of ``scenario``."""
+    if scenario == "country-rankings":
+        params = random_weights(rnd, catalog.country_groups)
+        params["discipline"] = pick(rnd, catalog.country_disciplines)
+        params["industry"] = pick(rnd, catalog.industries)
+        return "/api/country-rankings", params
+    if scenario == "university-rankings":
+        params = random_weights(rnd, catalog.uni_groups)
+        params["discipline"] = pick(rnd, catalog.uni_disciplines)
+        return "/api/university-rankings", params
+    if scenario == "university-rankings-page":
+        params = random_weights(rnd, catalog.uni_groups)
+        params["discipline"] = pick(rnd, catalog.uni_disciplines)
+        params.update({"offset": rnd.choice([0, 0, 0, 50, 100]), "limit": 50, "fields": "summary"})
+        return "/api/university-rankings", params
+    if scenario == "get-countries":
+        return "/api/get-countries", {"flags": "url"}
+    if scenario == "get-universities":
+        return "/api/get-universities", {"flags": "url"}
+    if scenario == "metric-groups":
+        return "/api/get-metric-groups", {}
+    if scenario == "country-info":
+        return "/api/country-info", {"country": rnd.choice(catalog.countries)}
+    if scenario == "uni-info":
+        return "/api/uni-info", {"uni": rnd.choice(catalog.universities)}
+    raise ValueError(f"Unknown scenario {scenario!r}")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(s[0] for s in samples)
+    errors = sum(1 for s in samples if not s[1])
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0,
+        "rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else None,
+    }
+
+
+def run(base_url, catalog, mix, concurrency, duration, timeout, seed):
+    scenarios, weights = zip(*mix.items())
+    samples = {scenario: [] for scenario in scenarios}
+    statuses = {scenario: {} for scenario in scenarios}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(n):
+        rnd = random.Random(seed * 1000 + n)
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            scenario = rnd.choices(scenarios, weights)[0]
+            path, params = build_request(scenario, rnd, catalog)
+            start = time.perf_counter()
+            try:
+                resp = session.get(base_url + path, params=params, timeout=timeout)
+                resp.content
+                status, ok = resp.status_code, resp.ok
+            except requests.RequestException as e:
+                status, ok = type(e).__name__, False
+            latency = round((time.perf_counter() - start) * 1000, 3)
+            with lock:
+                samples[scenario].append((latency, ok))
+                statuses[scenario][str(status)] = statuses[scenario].get(str(status), 0) + 1
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    report = {}
+    for scenario in scenarios:
+        report[scenario] = summarize(samples[scenario], elapsed)
+        report[scenario]["status_codes"] = statuses[scenario]
+    report["total"] = summarize([s for values in samples.values() for s in values], elapsed)
+    return report, elapsed
+
+
+def print_table(report):
+    header = f"{'scenario':<26}{'reqs':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err%':>8}"
+    print(header, file=sys.stderr)
+    print("-" * len(header), file=sys.stderr)
+    for scenario, stats in report.items():
+        if not stats["requests"]:
+            continue
+        print(
+            f"{scenario:<26}{stats['requests']:>8}{stats['rps']:>9}"
+            f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+            f"{stats['error_rate'] * 100:>8.2f}",
+            file=sys.stderr,
+        )
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r} (choose from {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the rankings backend.")
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run.")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds.")
+    parser.add_argument("--mix", type=parse_mix, help="scenario=weight,... (default: built-in mix)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-upstream", type=int, metavar="PORT", help="Serve a stub Nori API on this port.")
+    parser.add_argument("--stub-latency", type=float, default=0.5, help="Seconds the stub waits per call.")
+    parser.add_argument("--output", help="Write the JSON report here.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    base_url = args.base_url.rstrip("/")
+
+    mix = args.mix or dict(DEFAULT_MIX)
+    if args.stub_upstream:
+        start_stub(args.stub_upstream, args.stub_latency)
+        print(
+            "Stub Nori API running; start the app with\n"
+            f"  NORRY_URL=http://127.0.0.1:{args.stub_upstream}/chat/completions "
+            f"NORRY_SEARCH_URL=http://127.0.0.1:{args.stub_upstream}/search",
+            file=sys.stderr,
+        )
+    elif any(mix.get(s) for s in INFO_SCENARIOS):
+        if args.mix:
+            sys.exit("Info scenarios call the Nori API; pass --stub-upstream PORT as well.")
+        for scenario in INFO_SCENARIOS:
+            mix.pop(scenario)
+        print("⚠️ No --stub-upstream: skipping the info scenarios.", file=sys.stderr)
+
+    catalog = Catalog(base_url)
+    report, elapsed = run(base_url, catalog, mix, args.concurrency, args.duration, args.timeout, args.seed)
+    print_table(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "base_url": base_url,
+                "concurrency": args.concurrency,
+                "duration_seconds": round(elapsed, 3),
+                "mix": mix,
+                "stub_upstream": bool(args.stub_upstream),
+                "results": report,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
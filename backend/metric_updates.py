@@ -0,0 +1,49 @@
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from models import db, country_metrics, university_metrics
+from scoring import COUNTRY, UNIVERSITY, apply_metric_updates, dataset_fingerprint
+
+TABLES = {
+    COUNTRY: (country_metrics, "country_id"),
+    UNIVERSITY: (university_metrics, "university_id"),
+}
+
+
+def update_metric_values(kind, updates):
+    """Write (entity_id, metric_id, raw_value) changes and patch the scoring engine.
+
+    ``raw_value`` None deletes the stored value. The cached engine for ``kind``
+    is updated in place unless a change moves a metric's min/max, in which
+    case the next request reloads it. Returns True for an in-place update.
+    """
+    table, entity_field = TABLES[kind]
+    entity_column = table.c[entity_field]
+    # Last change per value wins; one upsert cannot touch a row twice
+    latest = {(entity_id, metric_id): raw_value for entity_id, metric_id, raw_value in updates}
+    updates = [(entity_id, metric_id, raw_value) for (entity_id, metric_id), raw_value in latest.items()]
+    upserts = [
+        {entity_field: entity_id, "metric_id": metric_id, "raw_value": raw_value}
+        for entity_id, metric_id, raw_value in updates
+        if raw_value is not None
+    ]
+    deletes = [(entity_id, metric_id) for entity_id, metric_id, raw_value in updates if raw_value is None]
+
+    before = dataset_fingerprint(kind)
+    try:
+        if upserts:
+            stmt = insert(table).values(upserts)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=[entity_field, "metric_id"],
+                set_={"raw_value": stmt.excluded.raw_value},
+            ))
+        if deletes:
+            db.session.execute(
+                table.delete().where(tuple_(entity_column, table.c.metric_id).in_(deletes))
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return apply_metric_updates(kind, updates, before)
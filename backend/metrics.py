@@ -0,0 +1,182 @@
+import contextlib
+import hmac
+import os
+import time
+
+from flask import Response, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from query_budget import query_count
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+except ImportError:  # prometheus_client is optional; without it nothing is recorded and /metrics is not served
+    prometheus_client = None
+
+METRICS_PATH = "/metrics"
+# /metrics is refused unless this is set and sent as "Authorization: Bearer <token>"
+# (Prometheus' authorization/bearer_token scrape settings)
+METRICS_SCRAPE_TOKEN = os.getenv("METRICS_SCRAPE_TOKEN")
+# With several gunicorn workers each process writes its samples here and
+# /metrics merges them; see gunicorn.conf.py
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+ENGINE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 20, 50, 100)
+UPSTREAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60)
+CIRCUIT_STATES = ("closed", "open", "half_open")
+
+
+class _NoOp:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, value=1):
+        pass
+
+    def dec(self, value=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+if prometheus_client is not None:
+    REQUEST_SECONDS = Histogram(
+        "http_request_duration_seconds", "Request latency, including streaming the body.",
+        ["method", "route", "status"],
+    )
+    IN_PROGRESS = Gauge(
+        "http_requests_in_progress", "Requests being handled.",
+        ["method", "route"], multiprocess_mode="livesum",
+    )
+    QUERIES = Histogram(
+        "db_queries_per_request", "SQL queries issued per request.",
+        ["route"], buckets=QUERY_COUNT_BUCKETS,
+    )
+    QUERY_SECONDS = Histogram(
+        "db_query_seconds_per_request", "Time spent in SQL queries per request.", ["route"],
+    )
+    UPSTREAM_SECONDS = Histogram(
+        "norry_request_duration_seconds", "Latency of norry upstream calls, failed ones included.",
+        ["call"], buckets=UPSTREAM_BUCKETS,
+    )
+    UPSTREAM_ERRORS = Counter(
+        "norry_errors_total", "Failed norry upstream calls.", ["call", "error"],
+    )
+    CIRCUIT_STATE = Gauge(
+        "norry_circuit_state", "Workers whose norry circuit breaker is in each state.",
+        ["state"], multiprocess_mode="livesum",
+    )
+    CIRCUIT_TRIPS = Counter("norry_circuit_trips_total", "Times the norry circuit breaker opened.")
+    CIRCUIT_REJECTIONS = Counter(
+        "norry_circuit_rejections_total", "Norry calls refused by the open circuit breaker, without calling upstream.",
+    )
+    ENGINE_SECONDS = Histogram(
+        "ranking_engine_seconds", "Ranking engine time per stage.",
+        ["kind", "stage"], buckets=ENGINE_BUCKETS,
+    )
+else:
+    REQUEST_SECONDS = IN_PROGRESS = QUERIES = QUERY_SECONDS = _NoOp()
+    UPSTREAM_SECONDS = UPSTREAM_ERRORS = CIRCUIT_STATE = CIRCUIT_TRIPS = CIRCUIT_REJECTIONS = _NoOp()
+    ENGINE_SECONDS = _NoOp()
+
+
+def observe_engine(kind, stage, seconds):
+    """Record ``seconds`` of ranking engine work; ``stage`` is load, normalize, score or serialize."""
+    ENGINE_SECONDS.labels(kind, stage).observe(seconds)
+
+
+@contextlib.contextmanager
+def upstream_call(call):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(call, type(e).__name__).inc()
+        raise
+    finally:
+        UPSTREAM_SECONDS.labels(call).observe(time.perf_counter() - start)
+
+
+def set_circuit_state(state):
+    for name in CIRCUIT_STATES:
+        CIRCUIT_STATE.labels(name).set(1 if name == state else 0)
+
+
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if started and has_app_context():
+        g.query_seconds = g.get("query_seconds", 0.0) + time.perf_counter() - started.pop()
+
+
+def _start_request():
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    if route == METRICS_PATH:
+        return
+    labels = (request.method, route)
+    IN_PROGRESS.labels(*labels).inc()
+    g.metrics_request = (labels, time.perf_counter())
+
+
+def _finish_request(labels, start, status):
+    REQUEST_SECONDS.labels(*labels, str(status)).observe(time.perf_counter() - start)
+    IN_PROGRESS.labels(*labels).dec()
+
+
+def _record_response(response):
+    state = g.pop("metrics_request", None)
+    if state is None:
+        return response
+    labels, start = state
+    QUERIES.labels(labels[1]).observe(query_count())
+    QUERY_SECONDS.labels(labels[1]).observe(g.get("query_seconds", 0.0))
+    # Streamed bodies are still being sent after this hook; stop the clock
+    # when the server closes the response
+    status = response.status_code
+    response.call_on_close(lambda: _finish_request(labels, start, status))
+    return response
+
+
+def _record_error(exc):
+    # after_request does not run when an exception propagates
+    state = g.pop("metrics_request", None)
+    if state is not None:
+        _finish_request(*state, 500)
+
+
+def metrics_view():
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not METRICS_SCRAPE_TOKEN or not hmac.compare_digest(token, METRICS_SCRAPE_TOKEN):
+        return Response("Forbidden\n", status=403, content_type="text/plain")
+
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return Response(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    if prometheus_client is None:
+        print("⚠️ prometheus_client is not installed; /metrics is disabled")
+        return
+
+    set_circuit_state("closed")
+    if not event.contains(Engine, "before_cursor_execute", _query_started):
+        event.listen(Engine, "before_cursor_execute", _query_started)
+        event.listen(Engine, "after_cursor_execute", _query_finished)
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_record_error)
+    app.add_url_rule(METRICS_PATH, "metrics", metrics_view)
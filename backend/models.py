@@ -1,6 +1,7 @@
 from linecache import lazycache
 from db import db
 from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.orm import deferred
 
 class Country(db.Model):
     __tablename__ = 'countries'
@@ -8,7 +9,8 @@ class Country(db.Model):
     name = db.Column(db.String(100), unique=True, nullable=False)
     region = db.Column(db.Text)
     country_code = db.Column(db.String(3), unique=True, nullable=True)
-    flag = db.Column(db.LargeBinary, nullable=True) 
+    # Only loaded where asked for with undefer(Country.flag)
+    flag = deferred(db.Column(db.LargeBinary, nullable=True))
     
     metrics = db.relationship(
         'Metric',
@@ -122,6 +124,7 @@ class CountryDetails(db.Model):
     country_id = db.Column(db.Integer, db.ForeignKey('countries.id'), unique=True, nullable=False)
     country_name = db.Column(db.String(100), nullable=False)
     cards = db.Column(JSONB, nullable=False)
+    citations = db.Column(JSONB, nullable=True)
     fetch_date = db.Column(db.DateTime, nullable=False)
     
     country = db.relationship("Country", back_populates="details")
@@ -133,6 +136,15 @@ class UniversityDetails(db.Model):
     uni_id = db.Column(db.Integer, db.ForeignKey('universities.id'), unique=True, nullable=False)
     uni_name = db.Column(db.String(100), nullable=False)
     cards = db.Column(JSONB, nullable=False)
+    citations = db.Column(JSONB, nullable=True)
     fetch_date = db.Column(db.DateTime, nullable=False)
     
-    university = db.relationship("University", back_populates="details")
\ No newline at end of file
+    university = db.relationship("University", back_populates="details")
+
+class CitationMetadata(db.Model):
+    __tablename__ = 'citation_metadata'
+
+    url = db.Column(db.Text, primary_key=True)
+    title = db.Column(db.Text, nullable=True)
+    date = db.Column(db.Text, nullable=True)
+    fetched_at = db.Column(db.DateTime, nullable=False, index=True)
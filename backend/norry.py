@@ -1,72 +1,232 @@
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+import citation_cache
+import metrics
 
 load_dotenv()
 
 API_KEY = os.getenv("NORRY_API_KEY")
-URL = "https://api.perplexity.ai/chat/completions"
-SEARCH_URL = "https://api.perplexity.ai/search"
+URL = os.getenv("NORRY_URL", "https://api.perplexity.ai/chat/completions")
+SEARCH_URL = os.getenv("NORRY_SEARCH_URL", "https://api.perplexity.ai/search")
+
+# Citation lookups: parallel workers, per-lookup timeout, and the overall
+# budget after which missing titles are returned empty
+ENRICH_WORKERS = int(os.getenv("NORRY_ENRICH_WORKERS", "8"))
+ENRICH_TIMEOUT = float(os.getenv("NORRY_ENRICH_TIMEOUT", "10"))
+ENRICH_DEADLINE = float(os.getenv("NORRY_ENRICH_DEADLINE", "6"))
+
+# Chat completion deadlines, and the circuit breaker that stops calling
+# upstream after BREAKER_FAILURES consecutive failed or slow (> BREAKER_SLOW_SECONDS)
+# calls until a probe after BREAKER_RESET_SECONDS succeeds
+CONNECT_TIMEOUT = float(os.getenv("NORRY_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("NORRY_READ_TIMEOUT", "45"))
+BREAKER_FAILURES = int(os.getenv("NORRY_BREAKER_FAILURES", "5"))
+BREAKER_SLOW_SECONDS = float(os.getenv("NORRY_BREAKER_SLOW_SECONDS", "30"))
+BREAKER_RESET_SECONDS = float(os.getenv("NORRY_BREAKER_RESET_SECONDS", "60"))
 
 HEADERS = {
     "Authorization": f"Bearer {API_KEY}",
     "Content-Type": "application/json",
 }
 
-def enrich_citations(urls: list[str]) -> list[dict]:
-    if not urls:
-        return []
+_executor = ThreadPoolExecutor(max_workers=ENRICH_WORKERS, thread_name_prefix="norry-enrich")
+_session = None
+_session_lock = threading.Lock()
 
-    enriched = []
+class CircuitOpenError(Exception):
+    pass
 
-    for url in urls:
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold, slow_call_seconds, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    self.rejected += 1
+                    metrics.CIRCUIT_REJECTIONS.inc()
+                    raise CircuitOpenError("Upstream circuit is open")
+                self.state = self.HALF_OPEN
+                metrics.set_circuit_state(self.state)
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    metrics.CIRCUIT_REJECTIONS.inc()
+                    raise CircuitOpenError("Upstream circuit is half-open, probe in flight")
+                self._probing = True
+
+    def _record(self, ok):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.state = self.CLOSED
+                self.failures = 0
+                metrics.set_circuit_state(self.state)
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                    metrics.CIRCUIT_TRIPS.inc()
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                metrics.set_circuit_state(self.state)
+
+    def call(self, fn):
+        self._before_call()
+        start = time.monotonic()
         try:
-            payload = {
-                "query": url,
-                "max_results": 1,
-                "max_tokens_per_page": 256,
+            result = fn()
+        except Exception:
+            self._record(False)
+            raise
+        self._record(time.monotonic() - start <= self.slow_call_seconds)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
             }
 
-            resp = requests.post(
-                SEARCH_URL,
-                headers={
-                    "Authorization": f"Bearer {API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-                timeout=10,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-
-            results = data.get("results", [])
-            if not results:
-                enriched.append({
-                    "url": url,
-                    "title": None,
-                    "date": None,
-                })
-                continue
-
-            top = results[0]
-            enriched.append({
-                "url": url,
-                "title": top.get("title"),
-                "date": top.get("date"),
-            })
+breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_SLOW_SECONDS, BREAKER_RESET_SECONDS)
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=ENRICH_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def search_citation(url: str) -> dict:
+    payload = {
+        "query": url,
+        "max_results": 1,
+        "max_tokens_per_page": 256,
+    }
+
+    with metrics.upstream_call("search"):
+        resp = _get_session().post(
+            SEARCH_URL,
+            headers={
+                "Authorization": f"Bearer {API_KEY}",
+                "Content-Type": "application/json",
+            },
+            json=payload,
+            timeout=ENRICH_TIMEOUT,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+
+    results = data.get("results", [])
+    if not results:
+        return {
+            "url": url,
+            "title": None,
+            "date": None,
+        }
+
+    top = results[0]
+    return {
+        "url": url,
+        "title": top.get("title"),
+        "date": top.get("date"),
+    }
+
+def _failed_citation(url: str, error: Exception) -> dict:
+    print(f"⚠️ Failed to enrich citation {url}: {error}")
+    return {
+        "url": url,
+        "title": None,
+        "date": None,
+        "snippet": None,
+    }
+
+def enrich_citations(urls: list[str], deadline: float = None) -> list[dict]:
+    if not urls:
+        return []
+
+    # Known URLs come from the citation cache in one query; only the rest are
+    # searched
+    cached = citation_cache.lookup(urls)
+    missing = list(dict.fromkeys(url for url in urls if url not in cached))
+
+    # Look every URL up in parallel; anything still running at the deadline
+    # comes back without a title/date rather than holding up the response
+    deadline = ENRICH_DEADLINE if deadline is None else deadline
+    futures = {url: _executor.submit(search_citation, url) for url in missing}
+    if futures:
+        wait(futures.values(), timeout=deadline)
+
+    found, failed = {}, {}
+    for url, future in futures.items():
+        if not future.done():
+            if not future.cancel():
+                citation_cache.store_when_done(future)
+            print(f"⚠️ Citation enrichment for {url} missed the {deadline}s deadline")
+            continue
+        try:
+            found[url] = future.result()
         except Exception as e:
-            print(f"⚠️ Failed to enrich citation {url}: {e}")
+            failed[url] = _failed_citation(url, e)
+    citation_cache.store(list(found.values()))
+
+    enriched = []
+    for url in urls:
+        if url in cached:
+            enriched.append(dict(cached[url]))
+        elif url in found:
+            enriched.append(dict(found[url]))
+        elif url in failed:
+            enriched.append(dict(failed[url]))
+        else:
             enriched.append({
                 "url": url,
                 "title": None,
                 "date": None,
-                "snippet": None,
             })
 
     return enriched
 
-def get_country_info(country: str):
+def chat_completion(data: dict) -> dict:
+    # Timed inside the breaker, so rejected calls stay out of the latency
+    # histogram; they are counted in norry_circuit_rejections_total instead
+    def post():
+        with metrics.upstream_call("chat"):
+            resp = _get_session().post(
+                URL, headers=HEADERS, json=data, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+            )
+            resp.raise_for_status()
+            return resp.json()
+
+    return breaker.call(post)
+
+def get_country_info(country: str, enrich: bool = True):
     schema = {
         "type": "object",
         "properties": {
@@ -125,19 +285,18 @@ Country: {country}
         },
     }
 
-    resp = requests.post(URL, headers=HEADERS, json=data)
-    resp.raise_for_status()
-    res_json = resp.json()
+    res_json = chat_completion(data)
 
     content_str = res_json["choices"][0]["message"]["content"]
     cards_obj = json.loads(content_str)  
 
     citations = res_json.get("citations", [])  
-    citations = enrich_citations(citations)
+    if enrich:
+        citations = enrich_citations(citations)
 
     return cards_obj, citations
 
-def get_uni_info(university: str):
+def get_uni_info(university: str, enrich: bool = True):
     schema = {
         "type": "object",
         "properties": {
@@ -201,14 +360,13 @@ University: {university}
         },
     }
 
-    resp = requests.post(URL, headers=HEADERS, json=data)
-    resp.raise_for_status()
-    res_json = resp.json()
+    res_json = chat_completion(data)
 
     content_str = res_json["choices"][0]["message"]["content"]
     cards_obj = json.loads(content_str)
 
     citations = res_json.get("citations", [])
-    citations = enrich_citations(citations)
+    if enrich:
+        citations = enrich_citations(citations)
 
     return cards_obj, citations
\ No newline at end of file
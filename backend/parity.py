@@ -0,0 +1,319 @@
+"""Check a ranking implementation against reference.py, and its latency against a baseline.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/path_bench \
+        python parity.py --fixture small --reset --cases 2000 --baseline parity_baseline.json
+
+Random weight/discipline/industry inputs go to both reference.py and the
+candidate module (default: utils). Every result must have the same order
+and keys, and every number must match within --tolerance and keep its
+int/float type. Unless --no-json, the JSON the ranking routes stream
+(Ranking.json_chunks) must also be byte-identical to jsonify of the
+reference result. The first --sensitivity-cases inputs per kind also run
+as radius-0 sensitivity sweeps, in which no rank may move. The
+candidate's median and p95 latency per kind are then compared with
+--baseline, and the run fails if either exceeds the baseline by more than
+--max-regression.
+--update-baseline records the current timings instead.
+
+Exits non-zero on any mismatch or regression.
+"""
+import argparse
+import importlib
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+import synthetic
+from bench import SCALES, percentile
+
+UNKNOWN_NAME = "Not A Real Name"
+
+
+def random_weights(rnd, group_ids, decimals):
+    choice = rnd.random()
+    if choice < 0.05:
+        return None
+    if choice < 0.1:
+        return {}
+    chosen = rnd.sample(group_ids, rnd.randint(1, len(group_ids))) if group_ids else []
+    weights = {gid: rnd.choice([0, 1, 0.5, round(rnd.random(), rnd.randint(1, decimals))]) for gid in chosen}
+    if rnd.random() < 0.05:
+        # Groups the ranking kind does not have must be ignored
+        weights[max(group_ids or [0]) + 1] = 1
+    return weights
+
+
+def random_names(rnd, names, most=3):
+    if rnd.random() < 0.3:
+        return rnd.choice([None, []])
+    picked = rnd.sample(names, rnd.randint(1, min(most, len(names)))) if names else []
+    if rnd.random() < 0.1:
+        picked.append(UNKNOWN_NAME)
+    return picked
+
+
+def generate_cases(rnd, count, decimals, group_ids, disciplines, industries=None):
+    cases = [{"group_weights": None}, {"group_weights": {}}]
+    while len(cases) < count:
+        case = {
+            "group_weights": random_weights(rnd, group_ids, decimals),
+            "selected_disciplines": random_names(rnd, disciplines),
+        }
+        if industries is not None:
+            case["selected_industries"] = random_names(rnd, industries)
+        cases.append(case)
+    return cases[:count]
+
+
+def diff(expected, actual, tolerance, path="$"):
+    """Return the first difference between two results as a string, or None."""
+    if isinstance(expected, bool) or isinstance(actual, bool):
+        return None if expected is actual else f"{path}: {expected!r} != {actual!r}"
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        # 50 and 50.0 serialize differently
+        if type(expected) is not type(actual):
+            return f"{path}: {expected!r} ({type(expected).__name__}) != {actual!r} ({type(actual).__name__})"
+        if math.isclose(expected, actual, rel_tol=0, abs_tol=tolerance):
+            return None
+        return f"{path}: {expected!r} != {actual!r}"
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        if list(expected) != list(actual) and set(expected) != set(actual):
+            return f"{path}: keys {sorted(expected)} != {sorted(actual)}"
+        for key in expected:
+            found = diff(expected[key], actual[key], tolerance, f"{path}.{key}")
+            if found:
+                return found
+        return None
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return f"{path}: length {len(expected)} != {len(actual)}"
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            found = diff(e, a, tolerance, f"{path}[{i}]")
+            if found:
+                return found
+        return None
+    return None if expected == actual else f"{path}: {expected!r} != {actual!r}"
+
+
+def reference_json(result):
+    # What jsonify sends: sorted keys, compact, ASCII-escaped
+    return json.dumps(result, ensure_ascii=True, sort_keys=True, separators=(",", ":")).encode()
+
+
+def json_diff(expected, actual):
+    if expected == actual:
+        return None
+    at = next((i for i, (e, a) in enumerate(zip(expected, actual)) if e != a), min(len(expected), len(actual)))
+    return f"served JSON differs at byte {at}: {expected[at - 40:at + 40]!r} != {actual[at - 40:at + 40]!r}"
+
+
+def check_kind(name, reference_fn, candidate_fn, cases, id_field, tolerance, max_failures, served_fn=None):
+    failures, timings = [], []
+    for n, case in enumerate(cases):
+        expected = reference_fn(**case)
+        start = time.perf_counter()
+        actual = candidate_fn(**case)
+        timings.append((time.perf_counter() - start) * 1000)
+
+        expected_order = [r[id_field] for r in expected]
+        actual_order = [r[id_field] for r in actual]
+        if expected_order != actual_order:
+            found = next(
+                (f"$[{i}].{id_field}: {e} != {a}" for i, (e, a) in enumerate(zip(expected_order, actual_order)) if e != a),
+                f"$: length {len(expected_order)} != {len(actual_order)}",
+            )
+        else:
+            found = diff(expected, actual, tolerance)
+        if not found and served_fn is not None:
+            found = json_diff(reference_json(expected), served_fn(**case))
+        if found:
+            failures.append({"case": case, "difference": found})
+            print(f"❌ {name} case {n}: {found}\n   inputs: {case}", file=sys.stderr)
+            if len(failures) >= max_failures:
+                break
+
+    return failures, {
+        "cases": len(timings),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+    }
+
+
+def check_sensitivity(kind, cases, max_failures):
+    """A radius-0 sweep only re-scores the base weights, so no entity's rank may move."""
+    from scoring import get_engine
+    from sensitivity import sensitivity
+
+    engine = get_engine(kind)
+    failures = []
+    for n, case in enumerate(cases):
+        try:
+            sweep = sensitivity(
+                engine, case["group_weights"], 0, samples=2,
+                selected_disciplines=case.get("selected_disciplines"),
+                selected_industries=case.get("selected_industries"),
+            )
+        except ValueError:
+            # All-zero weights cannot be swept
+            continue
+        moved = next((r for r in sweep["results"] if not r["min_rank"] == r["max_rank"] == r["base_rank"]), None)
+        if moved:
+            failures.append({"case": case, "difference": moved})
+            print(f"❌ {kind} sensitivity case {n}: {moved}\n   inputs: {case}", file=sys.stderr)
+            if len(failures) >= max_failures:
+                break
+    return failures
+
+
+def check_latency(timings, baseline, max_regression, min_regression_ms):
+    regressions = []
+    for name, current in timings.items():
+        recorded = baseline.get(name)
+        if not recorded:
+            print(f"⚠️ No baseline for {name}; skipping the latency gate", file=sys.stderr)
+            continue
+        for stat in ("median_ms", "p95_ms"):
+            # Sub-millisecond timings are too noisy for a purely relative limit
+            limit = max(recorded[stat] * (1 + max_regression), recorded[stat] + min_regression_ms)
+            if current[stat] > limit:
+                regressions.append(
+                    f"{name} {stat} {current[stat]} > {round(limit, 3)} "
+                    f"(baseline {recorded[stat]} + max({max_regression:.0%}, {min_regression_ms}ms))"
+                )
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ranking parity and latency gate.")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--fixture", help=f"Fill the database with a synthetic preset ({', '.join(SCALES)}) first.")
+    parser.add_argument("--reset", action="store_true", help="Required with --fixture: drops every table.")
+    parser.add_argument("--candidate", default="utils", help="Module with calculate_*_scores to check.")
+    parser.add_argument("--cases", type=int, default=1000, help="Random inputs per ranking kind.")
+    parser.add_argument(
+        "--weight-decimals", type=int, default=2,
+        help="Decimal places of random weights. The sliders send 2; ranking_cache rounds "
+        "anything finer than RANKING_CACHE_PRECISION, which shows up here as mismatches.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=0.0, help="Absolute tolerance for numbers.")
+    parser.add_argument("--no-json", action="store_true", help="Skip the byte check of the streamed JSON.")
+    parser.add_argument(
+        "--sensitivity-cases", type=int, default=200,
+        help="Cases per kind also run as radius-0 sensitivity sweeps (0 to skip).",
+    )
+    parser.add_argument("--max-failures", type=int, default=10)
+    parser.add_argument("--baseline", help="JSON file with the recorded candidate latencies.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed slowdown, as a fraction.")
+    parser.add_argument(
+        "--min-regression-ms", type=float, default=1.0, help="Slowdowns smaller than this never fail."
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.fixture and not args.reset:
+        sys.exit("--fixture drops every table in the target database; pass --reset as well.")
+    synthetic.use_database(args.database_url)
+
+    from app import app
+    from models import MetricGroup, CountryDisciplines, CountryIndustry, UniversityDisciplines
+    from ranking_cache import cached_ranking
+    from scoring import COUNTRY, UNIVERSITY
+    import reference
+
+    def served(kind):
+        def run(group_weights=None, selected_disciplines=None, selected_industries=None):
+            ranking = cached_ranking(kind, group_weights, selected_disciplines, selected_industries)
+            return b"".join(ranking.json_chunks())
+        return None if args.no_json else run
+
+    candidate = importlib.import_module(args.candidate)
+    rnd = random.Random(args.seed)
+
+    with app.app_context():
+        if args.fixture:
+            synthetic.generate(seed=args.seed, **SCALES[args.fixture])
+
+        groups = MetricGroup.query.all()
+        country_groups = [g.id for g in groups if g.category in ("country", "both")]
+        uni_groups = [g.id for g in groups if g.category in ("uni", "both")]
+        country_disciplines = sorted({d for row in CountryDisciplines.query.all() for d in row.top_disciplines or []})
+        industries = sorted({i for row in CountryIndustry.query.all() for i in row.dominant_industries or []})
+        uni_disciplines = sorted({d for row in UniversityDisciplines.query.all() for d in row.top_disciplines or []})
+
+        # Warm the candidate's load path so the gate times scoring, not start-up
+        candidate.calculate_country_scores()
+        candidate.calculate_university_scores()
+
+        country_cases = generate_cases(
+            rnd, args.cases, args.weight_decimals, country_groups, country_disciplines, industries
+        )
+        uni_cases = generate_cases(rnd, args.cases, args.weight_decimals, uni_groups, uni_disciplines)
+        country_failures, country_timing = check_kind(
+            "country",
+            reference.calculate_country_scores,
+            candidate.calculate_country_scores,
+            country_cases,
+            "country_id",
+            args.tolerance,
+            args.max_failures,
+            served(COUNTRY),
+        )
+        uni_failures, uni_timing = check_kind(
+            "university",
+            reference.calculate_university_scores,
+            candidate.calculate_university_scores,
+            uni_cases,
+            "university_id",
+            args.tolerance,
+            args.max_failures,
+            served(UNIVERSITY),
+        )
+
+        sensitivity_failures = []
+        if args.sensitivity_cases:
+            sensitivity_failures = (
+                check_sensitivity(COUNTRY, country_cases[:args.sensitivity_cases], args.max_failures)
+                + check_sensitivity(UNIVERSITY, uni_cases[:args.sensitivity_cases], args.max_failures)
+            )
+
+    timings = {"calculate_country_scores": country_timing, "calculate_university_scores": uni_timing}
+    print(json.dumps(timings, indent=2))
+
+    failed = bool(country_failures or uni_failures or sensitivity_failures)
+    if country_failures or uni_failures:
+        print(f"❌ {len(country_failures)} country and {len(uni_failures)} university mismatches", file=sys.stderr)
+    else:
+        print(f"✅ {country_timing['cases']} country and {uni_timing['cases']} university cases match", file=sys.stderr)
+    if sensitivity_failures:
+        print(f"❌ {len(sensitivity_failures)} radius-0 sensitivity sweeps moved a rank", file=sys.stderr)
+
+    if args.baseline and args.update_baseline:
+        if failed:
+            sys.exit("Not recording a baseline for a candidate that fails parity.")
+        with open(args.baseline, "w") as f:
+            json.dump(timings, f, indent=2)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+    elif args.baseline:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"No baseline at {args.baseline}; record one with --update-baseline.")
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = check_latency(timings, baseline, args.max_regression, args.min_regression_ms)
+        for message in regressions:
+            print(f"❌ Latency regression: {message}", file=sys.stderr)
+        failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
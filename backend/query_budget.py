@@ -0,0 +1,74 @@
+import functools
+import os
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.query_count = g.get("query_count", 0) + 1
+
+
+def init_query_budget(app):
+    # Strict mode raises instead of logging, so tests fail on a new N+1.
+    # Unset, it follows app.testing at request time
+    strict = os.getenv("QUERY_BUDGET_STRICT")
+    if strict is not None:
+        app.config["QUERY_BUDGET_STRICT"] = strict.lower() in ("1", "true", "yes")
+
+    if not event.contains(Engine, "before_cursor_execute", _count_query):
+        event.listen(Engine, "before_cursor_execute", _count_query)
+
+
+def query_count():
+    return g.get("query_count", 0)
+
+
+def _strict(app):
+    strict = app.config.get("QUERY_BUDGET_STRICT")
+    return app.testing if strict is None else strict
+
+
+def query_budget(limit):
+    """Warn (or raise, in strict mode) when a view issues more than ``limit`` queries.
+
+    Streamed bodies are checked when the response closes, counting queries
+    made under ``stream_with_context``; the status has been sent by then, so
+    an overrun is logged as an error instead of raised.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            start = query_count()
+            response = view(*args, **kwargs)
+            label = f"{request.method} {request.path}"
+
+            if getattr(response, "is_streamed", False):
+                app, request_globals = current_app._get_current_object(), g._get_current_object()
+
+                def check_streamed():
+                    used = request_globals.get("query_count", 0) - start
+                    if used > limit:
+                        app.logger.error(f"{label} issued {used} SQL queries (budget {limit}) while streaming")
+
+                response.call_on_close(check_streamed)
+                return response
+
+            used = query_count() - start
+            if used > limit:
+                message = f"{label} issued {used} SQL queries (budget {limit})"
+                if _strict(current_app):
+                    raise QueryBudgetExceeded(message)
+                current_app.logger.warning(message)
+            return response
+
+        wrapper.query_budget = limit
+        return wrapper
+
+    return decorator
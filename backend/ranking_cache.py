@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from http_cache import query_etag
+from scoring import get_engine
+
+CACHE_SIZE = int(os.getenv("RANKING_CACHE_SIZE", "256"))
+# Each cached Ranking keeps about 70 bytes per entity (its score lists and
+# arrays): ~3.5 MB at 50k universities. Entries are also evicted once they
+# hold more entities than this in total, ~140 MB per worker by default
+CACHE_MAX_ENTITIES = int(os.getenv("RANKING_CACHE_MAX_ENTITIES", "2000000"))
+CACHE_TTL = float(os.getenv("RANKING_CACHE_TTL", "300"))
+# Decimal places weights are rounded to before scoring; slider moves smaller
+# than this share a cache entry
+WEIGHT_PRECISION = int(os.getenv("RANKING_CACHE_PRECISION", "3"))
+
+_MISSING = object()
+
+
+class LRUCache:
+    """LRU with a TTL, bounded by entry count and by the total ``len()`` of the values."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, max_weight=CACHE_MAX_ENTITIES):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[1] < time.monotonic():
+                self._pop(key)
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _pop(self, key):
+        self.weight -= self._data.pop(key)[2]
+
+    def set(self, key, value):
+        weight = len(value)
+        if self.maxsize <= 0 or weight > self.max_weight:
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, time.monotonic() + self.ttl, weight)
+            self.weight += weight
+            while len(self._data) > self.maxsize or self.weight > self.max_weight:
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self, match=None):
+        with self._lock:
+            if match is None:
+                self._data.clear()
+                self.weight = 0
+                return
+            for key in [k for k in self._data if match(k)]:
+                self._pop(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "entities": self.weight,
+                "max_entities": self.max_weight,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+ranking_cache = LRUCache()
+_cache_versions = {}
+
+
+def quantize_weights(group_weights, precision=WEIGHT_PRECISION):
+    if group_weights is None:
+        return None
+    return {int(gid): round(float(w), precision) for gid, w in group_weights.items()}
+
+
+def _engine_for(kind):
+    engine = get_engine(kind)
+
+    # A new dataset version makes every entry for this kind unreachable; drop
+    # them now rather than waiting for eviction
+    if _cache_versions.get(kind) not in (None, engine.version):
+        ranking_cache.clear(lambda key: key[0] == kind)
+    _cache_versions[kind] = engine.version
+    return engine
+
+
+def _cache_key(kind, engine, weights, selected_disciplines, selected_industries):
+    return (
+        kind,
+        engine.version,
+        None if weights is None else tuple(sorted(weights.items())),
+        tuple(sorted(selected_disciplines or [])),
+        tuple(sorted(selected_industries or [])),
+    )
+
+
+def cached_ranking(kind, group_weights=None, selected_disciplines=None, selected_industries=None):
+    engine = _engine_for(kind)
+    weights = quantize_weights(group_weights)
+    key = _cache_key(kind, engine, weights, selected_disciplines, selected_industries)
+    ranking = ranking_cache.get(key)
+    if ranking is None:
+        ranking = engine.score(weights, selected_disciplines, selected_industries)
+        ranking_cache.set(key, ranking)
+    return ranking
+
+
+def ranking_etag(kind, group_weights=None, selected_disciplines=None, selected_industries=None, *extra):
+    """Strong ETag from the dataset version and the normalised query, plus ``extra`` (paging)."""
+    engine = _engine_for(kind)
+    key = _cache_key(kind, engine, quantize_weights(group_weights), selected_disciplines, selected_industries)
+    return query_etag(*key, *extra)
+
+
+def cached_rankings(kind, scenarios):
+    """``cached_ranking`` for a list of (group_weights, disciplines, industries) tuples.
+
+    Cache misses are scored together with ``ScoringEngine.score_many``.
+    """
+    engine = _engine_for(kind)
+    scenarios = [
+        (quantize_weights(weights), disciplines, industries)
+        for weights, disciplines, industries in scenarios
+    ]
+    keys = [_cache_key(kind, engine, *scenario) for scenario in scenarios]
+    rankings = [ranking_cache.get(key) for key in keys]
+
+    missing = [i for i, ranking in enumerate(rankings) if ranking is None]
+    if missing:
+        scored = engine.score_many([scenarios[i] for i in missing])
+        for i, ranking in zip(missing, scored):
+            rankings[i] = ranking
+            ranking_cache.set(keys[i], ranking)
+    return rankings
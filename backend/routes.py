@@ -1,13 +1,36 @@
-from flask import Blueprint, request, jsonify
-from models import University, UniversityDisciplines, db, Country, CountryIndustry, CountryDisciplines, MetricGroup, CountryDetails, UniversityDetails, Metric, country_metrics, university_metrics
-from utils import calculate_country_scores, calculate_university_scores
-from norry import get_country_info, get_uni_info
+from flask import Blueprint, Response, request, jsonify, make_response, stream_with_context, url_for
+from models import University, UniversityDisciplines, db, Country, CountryIndustry, CountryDisciplines, MetricGroup, Metric, country_metrics, university_metrics
+import norry
+from cards import COUNTRY as COUNTRY_CARDS, UNIVERSITY as UNIVERSITY_CARDS
+from cards import fetch_live, find_record, is_fresh, refresh_in_background, stored_citations
+from query_budget import query_budget
+from ranking_cache import cached_ranking, cached_rankings, ranking_cache, ranking_etag
+from http_cache import compress_response, conditional, conditional_body
+from bootstrap import BOOTSTRAP_MAX_AGE, BOOTSTRAP_STALE_SECONDS, get_bundle
+from scoring import COUNTRY, UNIVERSITY, get_engine
+from sensitivity import sensitivity
+from metric_updates import update_metric_values
+import hmac
+import math
+import os
 import base64
+import hashlib
 import json
-from sqlalchemy.orm import joinedload
-from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, undefer
 
 bp = Blueprint('api', __name__, url_prefix='/api')
+bp.after_request(compress_response)
+
+FLAG_MAX_AGE = 60 * 60 * 24 * 365
+RANKING_FIELDS = ("full", "summary")
+BATCH_MAX_SCENARIOS = int(os.getenv("RANKING_BATCH_MAX_SCENARIOS", "200"))
+# Metric value writes are refused unless this is set and sent as X-Update-Token
+METRICS_UPDATE_TOKEN = os.getenv("METRICS_UPDATE_TOKEN")
+# Public origin of this API (e.g. https://path-rankings-backend.onrender.com)
+# for absolute flag URLs; set it in production. Without it they follow the
+# request's Host header
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
 
 # @bp.route('/add-countries', methods=['POST'])
 # def add_country():
@@ -54,9 +77,27 @@ bp = Blueprint('api', __name__, url_prefix='/api')
 #     db.session.commit()
 #     return jsonify({'message': 'Metric value added/updated'}), 201
 
+def country_list(external=True):
+    rows = db.session.query(
+        Country.id, Country.name, Country.region, func.md5(Country.flag).label('flag_hash')
+    ).all()
+    return [
+        {
+            "id": c.id,
+            "name": c.name,
+            "region": c.region,
+            "flag": flag_url(c.id, c.flag_hash, external)
+        }
+        for c in rows
+    ]
+
 @bp.route('/get-countries', methods=['GET'])
+@query_budget(1)
 def get_countries():
-    countries = Country.query.all()
+    if request.args.get('flags') == 'url':
+        return conditional_body(jsonify(country_list()))
+
+    countries = Country.query.options(undefer(Country.flag)).all()
 
     result = []
     for c in countries:
@@ -72,13 +113,43 @@ def get_countries():
             "flag": flag_data_url
         })
 
-    return jsonify(result), 200
+    return conditional_body(jsonify(result))
+
+def university_list(external=True):
+    rows = (
+        db.session.query(
+            University.id,
+            University.name,
+            University.city,
+            University.country_id,
+            Country.name.label('country_name'),
+            Country.region,
+            func.md5(Country.flag).label('flag_hash'),
+        )
+        .outerjoin(Country, University.country_id == Country.id)
+        .all()
+    )
+    return [
+        {
+            "id": u.id,
+            "name": u.name,
+            "city": u.city,
+            "country_name": u.country_name,
+            "region": u.region,
+            "country_flag": flag_url(u.country_id, u.flag_hash, external)
+        }
+        for u in rows
+    ]
 
 @bp.route('/get-universities', methods=['GET'])
+@query_budget(1)
 def get_universities():
     try:
+        if request.args.get('flags') == 'url':
+            return conditional_body(jsonify(university_list()))
+
         universities = db.session.query(University).options(
-            joinedload(University.country)
+            joinedload(University.country).undefer(Country.flag)
         ).all()
         
         result = []
@@ -100,7 +171,7 @@ def get_universities():
                 "country_flag": country_flag
             })
         
-        return jsonify(result), 200
+        return conditional_body(jsonify(result))
 
     except Exception as e:
         print(f"Error fetching university list: {e}")
@@ -110,7 +181,33 @@ def get_universities():
             "details": str(e)
         }), 500
 
+@bp.route('/flags/<int:country_id>', methods=['GET'])
+@query_budget(1)
+def get_flag(country_id):
+    flag = db.session.query(Country.flag).filter(Country.id == country_id).scalar()
+    if not flag:
+        return jsonify({"error": "Flag not found"}), 404
+
+    response = make_response(flag)
+    response.mimetype = 'image/png'
+    response.set_etag(hashlib.sha1(flag).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = FLAG_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+def flag_url(country_id, flag_hash, external=True):
+    # The hash in the query string changes with the image, so clients can
+    # treat each URL as immutable
+    if not flag_hash:
+        return None
+    path = url_for('api.get_flag', country_id=country_id, v=flag_hash[:12])
+    if PUBLIC_BASE_URL:
+        return PUBLIC_BASE_URL + path
+    return request.host_url.rstrip('/') + path if external else path
+
 @bp.route('/get-cities', methods=['GET'])
+@query_budget(1)
 def get_cities():
     try:
         cities = db.session.query(University.city).distinct().all()
@@ -129,16 +226,15 @@ def get_cities():
             "details": str(e)
         }), 500
 
+def region_list():
+    regions = db.session.query(Country.region).distinct().all()
+    return [{"region": r[0]} for r in regions if r[0]]
+
 @bp.route('/get-regions', methods=['GET'])
+@query_budget(1)
 def get_regions():
     try:
-        regions = db.session.query(Country.region).distinct().all()
-        
-        unique_regions = [r[0] for r in regions if r[0]]
-        
-        result = [{"region": region} for region in unique_regions]
-        
-        return jsonify(result), 200
+        return jsonify(region_list()), 200
     
     except Exception as e:
         print(f"Error fetching region list: {e}")
@@ -148,12 +244,17 @@ def get_regions():
             "details": str(e)
         }), 500
 
+def metric_group_list():
+    groups = MetricGroup.query.all()
+    return [{"id": g.id, "name": g.name, "description": g.description, "category": g.category} for g in groups]
+
 @bp.route('/get-metric-groups', methods=['GET'])
+@query_budget(1)
 def get_metric_groups():
-    groups = MetricGroup.query.all()
-    return jsonify([{"id": g.id, "name": g.name, "description": g.description, "category": g.category} for g in groups]), 200
+    return jsonify(metric_group_list()), 200
 
 @bp.route('/get-metrics', methods=['GET'])
+@query_budget(1)
 def get_metrics():
     metrics = Metric.query.all()
     return jsonify([
@@ -168,24 +269,66 @@ def get_metrics():
     ]), 200
 
 @bp.route('/industries', methods=['GET'])
+@query_budget(1)
 def get_country_industries():
     industries = CountryIndustry.query.all()
     result = [c.to_dict() for c in industries]
     return jsonify(result)
 
 @bp.route('/country-disciplines', methods=['GET'])
+@query_budget(1)
 def get_country_disciplines():
     disciplines = CountryDisciplines.query.all()
     result = [c.to_dict() for c in disciplines]
     return jsonify(result)
 
+def uni_discipline_list():
+    disciplines = UniversityDisciplines.query.options(
+        joinedload(UniversityDisciplines.university)
+    ).all()
+    return [c.to_dict() for c in disciplines]
+
 @bp.route('/uni-disciplines', methods=['GET'])
+@query_budget(1)
 def get_uni_disciplines():
-    disciplines = UniversityDisciplines.query.all()
-    result = [c.to_dict() for c in disciplines]
-    return jsonify(result)
+    return jsonify(uni_discipline_list())
+
+# Bundles are shared by every client, so flag URLs stay relative to the API
+# (absolute only with PUBLIC_BASE_URL) instead of using the first request's host
+BOOTSTRAP_PAGES = {
+    "country": lambda: {
+        "countries": country_list(external=False),
+        "regions": region_list(),
+        "metric_groups": metric_group_list(),
+        "industries": [c.to_dict() for c in CountryIndustry.query.all()],
+        "disciplines": [c.to_dict() for c in CountryDisciplines.query.all()],
+    },
+    "uni": lambda: {
+        "countries": country_list(external=False),
+        "regions": region_list(),
+        "universities": university_list(external=False),
+        "metric_groups": metric_group_list(),
+        "disciplines": uni_discipline_list(),
+    },
+}
+
+@bp.route('/bootstrap/<page>', methods=['GET'])
+@query_budget(8)
+def bootstrap(page):
+    build = BOOTSTRAP_PAGES.get(page)
+    if build is None:
+        return jsonify({"error": f"page must be one of {', '.join(BOOTSTRAP_PAGES)}"}), 404
+
+    bundle = get_bundle(page, build)
+    response = conditional(bundle.version, lambda: Response(bundle.body, mimetype="application/json"))
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = BOOTSTRAP_MAX_AGE
+    response.cache_control.stale_while_revalidate = BOOTSTRAP_STALE_SECONDS
+    return response
 
 @bp.route('/country-metrics', methods=['GET'])
+@query_budget(2)
 def get_country_metrics():
     country_id = request.args.get('country_id', type=int)
     country_name = request.args.get('country_name', type=str)
@@ -225,6 +368,7 @@ def get_country_metrics():
     return jsonify(results)
 
 @bp.route('/uni-metrics', methods=['GET'])
+@query_budget(2)
 def get_uni_metrics():
     uni_id = request.args.get('uni_id', type=int)
     uni_name = request.args.get('uni_name', type=str)
@@ -266,63 +410,86 @@ def get_uni_metrics():
 
     return jsonify(results)
 
+def metric_value_updates(kind, id_key):
+    token = request.headers.get("X-Update-Token", "")
+    if not METRICS_UPDATE_TOKEN or not hmac.compare_digest(token, METRICS_UPDATE_TOKEN):
+        return jsonify({"error": "Forbidden"}), 403
+
+    body = request.get_json(silent=True) or {}
+    updates = body.get("updates")
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"error": "updates must be a non-empty list"}), 400
+    try:
+        parsed = [
+            (
+                int(u[id_key]),
+                int(u["metric_id"]),
+                None if u.get("raw_value") is None else float(u["raw_value"]),
+            )
+            for u in updates
+        ]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"each update needs {id_key}, metric_id and raw_value: {e}"}), 400
+    if any(v is not None and not (math.isfinite(v) and v > -1) for _, _, v in parsed):
+        return jsonify({"error": "raw_value must be a finite number above -1, or null"}), 400
+
+    try:
+        incremental = update_metric_values(kind, parsed)
+    except Exception as e:
+        print(f"❌ Metric update failed: {str(e)}")
+        return jsonify({"success": False, "error": "Failed to update metric values.", "details": str(e)}), 500
+
+    return jsonify({"success": True, "updated": len(parsed), "incremental": incremental})
+
+@bp.route('/country-metrics', methods=['POST'])
+@query_budget(20)
+def update_country_metrics():
+    return metric_value_updates(COUNTRY, "country_id")
+
+@bp.route('/uni-metrics', methods=['POST'])
+@query_budget(20)
+def update_uni_metrics():
+    return metric_value_updates(UNIVERSITY, "uni_id")
+
+# Card queries: the record and its stored citations (2) on a hit. A live
+# fetch adds the advisory lock, the citation cache lookup and store, and the
+# card write (5). A worker that waited on another's fetch locks again and
+# reloads the record, and fetches itself if that fetch failed (7)
 @bp.route('/country-info', methods=['GET'])
+@query_budget(7)
 def country_info():
     country_name = request.args.get('country')
     if not country_name:
         return jsonify({"error": "Missing country parameter"}), 400
 
-    try:
-        cards_obj, citations_info = get_country_info(country_name)
-        cards = cards_obj.get("cards", []) if cards_obj else []
-        print("Live cards:", cards)
-        print("Citations:", citations_info)
-
-        if cards and len(cards) == 6:
-            country = Country.query.filter(Country.name.ilike(country_name)).first()
-            if country:
-                try:
-                    if country.details:
-                        country.details.cards = cards
-                        country.details.fetch_date = datetime.now()
-                    else:
-                        country.details = CountryDetails(
-                            country_id=country.id,
-                            country_name=country_name,
-                            cards=cards,
-                            fetch_date=datetime.now(),
-                        )
-                    db.session.commit()
-                except Exception as db_error:
-                    print(f"⚠️ Database update failed for {country_name}: {str(db_error)}")
+    country = find_record(COUNTRY_CARDS, country_name)
+    if country and country.details and country.details.cards:
+        if is_fresh(country.details):
+            source = "cache"
+        else:
+            refresh_in_background(COUNTRY_CARDS, country_name)
+            source = "stale"
+        return jsonify({
+            "country": country_name,
+            "cards": country.details.cards,
+            "citations": stored_citations(country.details),
+            "source": source,
+            "last_updated": country.details.fetch_date.isoformat() if country.details.fetch_date else None,
+        })
 
+    try:
+        live = fetch_live(COUNTRY_CARDS, country_name, country)
+        if live:
+            live_cards, citations_info = live
             return jsonify({
                 "country": country_name,
-                "cards": cards,
+                "cards": live_cards,
                 "citations": citations_info,
                 "source": "live",
             })
-        else:
-            print(f"⚠️ Live API returned {len(cards)} cards (expected 6)")
     except Exception as live_error:
         print(f"❌ Live API failed: {str(live_error)}")
 
-    try:
-        country = Country.query.filter(Country.name.ilike(country_name)).first()
-
-        if country and country.details and country.details.cards:
-            cards = country.details.cards
-            return jsonify({
-                "country": country_name,
-                "cards": cards,
-                "source": "fallback",
-                "last_updated": country.details.fetch_date.isoformat() if country.details.fetch_date else None,
-            })
-        else:
-            print(f"❌ No fallback data found for {country_name}")
-    except Exception as fallback_error:
-        print(f"❌ Fallback failed: {str(fallback_error)}")
-
     return jsonify({
         "country": country_name,
         "cards": [],
@@ -331,62 +498,40 @@ def country_info():
     }), 200
 
 @bp.route('/uni-info', methods=['GET'])
+@query_budget(7)
 def uni_info():
     university = request.args.get('uni')
     if not university:
         return jsonify({"error": "Missing university parameter"}), 400
 
-    try:
-        cards_obj, citations_info = get_uni_info(university)
-        cards = cards_obj.get("cards", []) if cards_obj else []
-        print("Live cards:", cards)
-        print("Citations:", citations_info)
-
-        if cards and len(cards) == 6:
-            uni = University.query.filter(University.name.ilike(university)).first()
-            if uni:
-                try:
-                    if uni.details:
-                        uni.details.cards = cards
-                        uni.details.fetch_date = datetime.now()
-                    else:
-                        uni.details = UniversityDetails(
-                            uni_id=uni.id,
-                            uni_name=university,
-                            cards=cards,
-                            fetch_date=datetime.now(),
-                        )
-                    db.session.commit()
-                except Exception as db_error:
-                    print(f"⚠️ Database update failed for {university}: {str(db_error)}")
+    uni = find_record(UNIVERSITY_CARDS, university)
+    if uni and uni.details and uni.details.cards:
+        if is_fresh(uni.details):
+            source = "cache"
+        else:
+            refresh_in_background(UNIVERSITY_CARDS, university)
+            source = "stale"
+        return jsonify({
+            "university": university,
+            "cards": uni.details.cards,
+            "citations": stored_citations(uni.details),
+            "source": source,
+            "last_updated": uni.details.fetch_date.isoformat() if uni.details.fetch_date else None,
+        })
 
+    try:
+        live = fetch_live(UNIVERSITY_CARDS, university, uni)
+        if live:
+            live_cards, citations_info = live
             return jsonify({
                 "university": university,
-                "cards": cards,
+                "cards": live_cards,
                 "citations": citations_info,
                 "source": "live",
             })
-        else:
-            print(f"⚠️ Live API returned {len(cards)} cards (expected 6)")
     except Exception as live_error:
         print(f"❌ Live API failed for {university}: {str(live_error)}")
 
-    try:
-        uni = University.query.filter(University.name.ilike(university)).first()
-
-        if uni and uni.details and uni.details.cards:
-            cards = uni.details.cards
-            return jsonify({
-                "university": university,
-                "cards": cards,
-                "source": "fallback",
-                "last_updated": uni.details.fetch_date.isoformat() if uni.details.fetch_date else None,
-            })
-        else:
-            print(f"❌ No fallback data found for {university}")
-    except Exception as fallback_error:
-        print(f"❌ Fallback failed for {university}: {str(fallback_error)}")
-
     return jsonify({
         "university": university,
         "cards": [],
@@ -394,7 +539,74 @@ def uni_info():
         "message": "No data available",
     }), 200
 
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def card_events(kind, name, name_key):
+    # stored cards first, then live cards, then enriched citations
+    record = find_record(kind, name)
+    details = record.details if record else None
+    if details and details.cards:
+        fresh = is_fresh(details)
+        yield sse("stored", {
+            name_key: name,
+            "cards": details.cards,
+            "citations": stored_citations(details),
+            "source": "cache" if fresh else "stale",
+            "last_updated": details.fetch_date.isoformat() if details.fetch_date else None,
+        })
+        if fresh:
+            yield sse("done", {"source": "cache"})
+            return
+
+    try:
+        live = fetch_live(kind, name, record, enrich=False)
+    except Exception as live_error:
+        print(f"❌ Live API failed for {name}: {str(live_error)}")
+        live = None
+
+    if not live:
+        yield sse("done", {"source": "stale" if details and details.cards else "none"})
+        return
+
+    live_cards, citation_urls = live
+    yield sse("cards", {name_key: name, "cards": live_cards, "source": "live"})
+    yield sse("citations", {name_key: name, "citations": norry.enrich_citations(citation_urls)})
+    yield sse("done", {"source": "live"})
+
+def event_stream(events):
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# The stream runs the same card queries, plus the stored citations lookup
+# before refreshing a stale record (8)
+@bp.route('/country-info/stream', methods=['GET'])
+@query_budget(8)
+def country_info_stream():
+    country_name = request.args.get('country')
+    if not country_name:
+        return jsonify({"error": "Missing country parameter"}), 400
+    return event_stream(card_events(COUNTRY_CARDS, country_name, "country"))
+
+@bp.route('/uni-info/stream', methods=['GET'])
+@query_budget(8)
+def uni_info_stream():
+    university = request.args.get('uni')
+    if not university:
+        return jsonify({"error": "Missing university parameter"}), 400
+    return event_stream(card_events(UNIVERSITY_CARDS, university, "university"))
+
+def ranking_response(ranking, offset=0, limit=None, fields="full"):
+    # Streamed straight from the ranking's cached JSON fragments
+    response = Response(ranking.json_chunks(offset, limit, fields), mimetype="application/json")
+    response.headers["X-Total-Count"] = str(len(ranking))
+    return response
+
 @bp.route("/country-rankings")
+@query_budget(10)
 def get_rankings():
     group_weights = {
         int(k.replace("group_", "")): float(v)
@@ -404,14 +616,13 @@ def get_rankings():
     selected_disciplines = request.args.getlist("discipline")
     selected_industries = request.args.getlist("industry")
 
-    results = calculate_country_scores(
-        group_weights=group_weights,
-        selected_disciplines=selected_disciplines,
-        selected_industries=selected_industries
-    )
-    return jsonify(results)
+    etag = ranking_etag(COUNTRY, group_weights, selected_disciplines, selected_industries)
+    return conditional(etag, lambda: ranking_response(
+        cached_ranking(COUNTRY, group_weights, selected_disciplines, selected_industries)
+    ))
 
 @bp.route('/university-rankings', methods=['GET'])
+@query_budget(10)
 def university_rankings():
     try:
         group_weights = {
@@ -420,10 +631,19 @@ def university_rankings():
             if k.startswith("group_")
         }
         selected_disciplines = request.args.getlist("discipline")
+        offset = request.args.get("offset", 0, type=int)
+        limit = request.args.get("limit", type=int)
+        fields = request.args.get("fields", "full")
 
-        ranked_results = calculate_university_scores(group_weights=group_weights, selected_disciplines=selected_disciplines)
-        
-        return jsonify(ranked_results)
+        if fields not in RANKING_FIELDS:
+            return jsonify({"error": f"fields must be one of {', '.join(RANKING_FIELDS)}"}), 400
+        if offset < 0 or (limit is not None and limit < 0):
+            return jsonify({"error": "offset and limit must be non-negative"}), 400
+
+        etag = ranking_etag(UNIVERSITY, group_weights, selected_disciplines, None, offset, limit, fields)
+        return conditional(etag, lambda: ranking_response(
+            cached_ranking(UNIVERSITY, group_weights, selected_disciplines), offset, limit, fields
+        ))
 
     except Exception as e:
         print(f"Error calculating university rankings: {e}")
@@ -431,4 +651,106 @@ def university_rankings():
             "success": False,
             "error": "Failed to calculate rankings.",
             "details": str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+def is_count(value):
+    # JSON true/false arrive as bool, which is an int subclass
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+def parse_scenario(scenario, kind):
+    if not isinstance(scenario, dict):
+        raise ValueError("each scenario must be an object")
+    weights = scenario.get("weights")
+    if weights is not None:
+        weights = {int(k): float(v) for k, v in weights.items()}
+    disciplines = [str(d) for d in scenario.get("disciplines") or []]
+    industries = [str(i) for i in scenario.get("industries") or []] if kind == COUNTRY else []
+    return weights, disciplines, industries
+
+def batch_rankings(kind):
+    body = request.get_json(silent=True) or {}
+    scenarios = body.get("scenarios")
+    offset = body.get("offset", 0)
+    limit = body.get("limit")
+    fields = body.get("fields", "full")
+
+    if not isinstance(scenarios, list) or not scenarios:
+        return jsonify({"error": "scenarios must be a non-empty list"}), 400
+    if len(scenarios) > BATCH_MAX_SCENARIOS:
+        return jsonify({"error": f"at most {BATCH_MAX_SCENARIOS} scenarios per request"}), 400
+    if fields not in RANKING_FIELDS:
+        return jsonify({"error": f"fields must be one of {', '.join(RANKING_FIELDS)}"}), 400
+    if not is_count(offset) or (limit is not None and not is_count(limit)):
+        return jsonify({"error": "offset and limit must be non-negative integers"}), 400
+    try:
+        parsed = [parse_scenario(scenario, kind) for scenario in scenarios]
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({"error": f"invalid scenario: {e}"}), 400
+
+    rankings = cached_rankings(kind, parsed)
+
+    def chunks():
+        yield b'{"rankings":['
+        for n, ranking in enumerate(rankings):
+            if n:
+                yield b","
+            yield from ranking.json_chunks(offset, limit, fields)
+        yield f'],"total":{len(rankings[0])}}}'.encode()
+
+    return Response(chunks(), mimetype="application/json")
+
+@bp.route('/country-rankings/batch', methods=['POST'])
+@query_budget(10)
+def country_rankings_batch():
+    return batch_rankings(COUNTRY)
+
+@bp.route('/university-rankings/batch', methods=['POST'])
+@query_budget(10)
+def university_rankings_batch():
+    return batch_rankings(UNIVERSITY)
+
+def sensitivity_sweep(kind):
+    body = request.get_json(silent=True) or {}
+    offset = body.get("offset", 0)
+    limit = body.get("limit")
+    if not is_count(offset) or (limit is not None and not is_count(limit)):
+        return jsonify({"error": "offset and limit must be non-negative integers"}), 400
+    try:
+        weights, disciplines, industries = parse_scenario(body, kind)
+        sweep = sensitivity(
+            get_engine(kind),
+            weights,
+            radius=float(body.get("radius", 0.1)),
+            samples=int(body.get("samples", 500)),
+            top_k=int(body.get("top_k", 10)),
+            method=body.get("method", "random"),
+            selected_disciplines=disciplines,
+            selected_industries=industries,
+            seed=body.get("seed"),
+        )
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    sweep["total"] = len(sweep["results"])
+    sweep["results"] = sweep["results"][offset:None if limit is None else offset + limit]
+    return jsonify(sweep)
+
+@bp.route('/country-rankings/sensitivity', methods=['POST'])
+@query_budget(10)
+def country_rankings_sensitivity():
+    return sensitivity_sweep(COUNTRY)
+
+@bp.route('/university-rankings/sensitivity', methods=['POST'])
+@query_budget(10)
+def university_rankings_sensitivity():
+    return sensitivity_sweep(UNIVERSITY)
+
+@bp.route('/ranking-cache', methods=['GET'])
+@query_budget(0)
+def ranking_cache_stats():
+    return jsonify(ranking_cache.stats()), 200
+
+@bp.route('/upstream-status', methods=['GET'])
+@query_budget(0)
+def upstream_status():
+    return jsonify({"norry": norry.breaker.stats()}), 200
@@ -0,0 +1,874 @@
+import copy
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import Numeric, Text, case, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from metrics import observe_engine
+from models import (
+    db,
+    Country,
+    University,
+    Metric,
+    MetricGroup,
+    country_metrics,
+    university_metrics,
+    CountryIndustry,
+    CountryDisciplines,
+    UniversityDisciplines,
+)
+
+COUNTRY = "country"
+UNIVERSITY = "uni"
+
+# How often (seconds) a worker re-checks the metric tables for changes before
+# reusing its in-memory matrices.
+VERSION_CHECK_SECONDS = float(os.getenv("SCORING_VERSION_CHECK_SECONDS", "30"))
+# Engines are reloaded at least this often even if the fingerprint matches
+REBUILD_SECONDS = float(os.getenv("SCORING_REBUILD_SECONDS", "3600"))
+
+# Streamed ranking responses are flushed in chunks of about this many bytes
+JSON_CHUNK_BYTES = 64 * 1024
+# Entities whose full-detail JSON (with the metrics maps) is cached per
+# engine; the rest are formatted on each request. Summary JSON is always cached
+JSON_DETAIL_CACHE_ENTITIES = int(os.getenv("SCORING_JSON_DETAIL_CACHE_ENTITIES", "2000"))
+
+# Compute the log/min-max normalisation with one window-function query instead
+# of in Python. Postgres' ln() can differ from math.log in the last bit, so this
+# is opt-in.
+SQL_NORMALIZE = os.getenv("SCORING_SQL_NORMALIZE", "false").lower() in ("1", "true", "yes")
+
+
+def dumps(value):
+    """Compact JSON with sorted keys and ASCII escapes, byte for byte what jsonify writes."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def _metric_table(kind):
+    return country_metrics if kind == COUNTRY else university_metrics
+
+
+def _entity_column(kind):
+    table = _metric_table(kind)
+    return table.c.country_id if kind == COUNTRY else table.c.university_id
+
+
+def _rows_digest(order_by, *columns):
+    # md5 of every row's columns in id order: any edit to them changes it
+    row_text = func.concat_ws("|", *[func.coalesce(cast(c, Text), "") for c in columns])
+    return select(func.md5(func.string_agg(row_text, aggregate_order_by(literal(","), order_by))))
+
+
+def dataset_fingerprint(kind):
+    """Version of everything ``ScoringEngine.load`` reads for ``kind``.
+
+    The small tables are hashed row by row. Metric values are too many for
+    that, so they get sums weighted by entity and metric id, which still
+    change when values move between cells. The sums are numeric: float sums
+    depend on the order Postgres adds the rows in, which varies between scans.
+    """
+    table = _metric_table(kind)
+    entity_column = _entity_column(kind)
+    raw_value = cast(table.c.raw_value, Numeric)
+    parts = [
+        select(func.count()).select_from(table),
+        select(func.coalesce(func.sum(raw_value), 0)),
+        select(func.coalesce(func.sum(raw_value * entity_column), 0)),
+        select(func.coalesce(func.sum(raw_value * table.c.metric_id), 0)),
+        _rows_digest(Metric.id, Metric.id, Metric.name, Metric.group_id, Metric.is_positive),
+        _rows_digest(MetricGroup.id, MetricGroup.id, MetricGroup.name, MetricGroup.category),
+        _rows_digest(Country.id, Country.id, Country.name, Country.region, Country.country_code),
+    ]
+    if kind == COUNTRY:
+        parts.append(_rows_digest(CountryDisciplines.id, CountryDisciplines.country, CountryDisciplines.top_disciplines))
+        parts.append(_rows_digest(CountryIndustry.id, CountryIndustry.country, CountryIndustry.dominant_industries))
+    else:
+        parts.append(_rows_digest(University.id, University.id, University.name, University.country_id, University.city))
+        parts.append(_rows_digest(UniversityDisciplines.id, UniversityDisciplines.uni_id, UniversityDisciplines.top_disciplines))
+
+    row = db.session.execute(select(*[q.scalar_subquery() for q in parts])).one()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:16]
+
+
+def round2(values):
+    """``round(v, 2)`` of every element of a float array.
+
+    np.round scales by 100 and can land on the other side of a tie than
+    Python's exact round, so values close to a tie are rounded one by one.
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(v, 2) for v in values[near_tie].tolist()]
+    return rounded
+
+
+# repr() of round(c / 100, 2) for c = 0..10000
+_CENT_TEXT = np.array([repr(round(c / 100, 2)) for c in range(10001)], dtype=object)
+
+
+def _format_escape(text):
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _inverted_index(top_lists):
+    """Map each discipline/industry to (entity rows, bonus) arrays.
+
+    An entity's bonus for an item is 100 - 20 * its first position in the
+    entity's top list.
+    """
+    postings = {}
+    for row, items in enumerate(top_lists):
+        seen = set()
+        for position, item in enumerate(items):
+            if item in seen:
+                continue
+            seen.add(item)
+            rows, bonuses = postings.setdefault(item, ([], []))
+            rows.append(row)
+            bonuses.append(100 - 20 * position)
+    return {
+        item: (np.array(rows, dtype=np.intp), np.array(bonuses, dtype=np.int64))
+        for item, (rows, bonuses) in postings.items()
+    }
+
+
+def _match_scores(index, selected, n_entities):
+    # Sum of bonuses over the selected items; only matching entities are touched
+    scores = np.zeros(n_entities, dtype=np.int64)
+    for sel in selected:
+        posting = index.get(sel)
+        if posting is not None:
+            rows, bonuses = posting
+            scores[rows] += bonuses
+    return scores.tolist()
+
+
+class ScoringEngine:
+    """Normalised entity x metric and entity x group matrices for one ranking kind.
+
+    Everything that does not depend on the request (log normalisation, group
+    averages, group min-max) is computed once in ``load``; ``score`` is then a
+    weighted sum over the group matrix plus a sort.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.version = None
+        self.entities = []
+        self.entity_index = {}
+        self.all_group_ids = []
+        self.group_ids = []
+        self.group_names = []
+        self.group_metrics = []
+        self.metric_ids = []
+        self.metric_names = []
+        self.metric_positive = None
+        self.metric_flat = None
+        self.log_values = None
+        self.log_min = None
+        self.log_max = None
+        self.metric_counts = None
+        self.normalised = None
+        self.raw_group = None
+        self.group_present = None
+        self.group_flat = None
+        self.group_min = None
+        self.group_max = None
+        self.group_scores = None
+        self.discipline_index = {}
+        self.industry_index = {}
+        self._raw_group_py = []
+        self._group_score_py = []
+        self._metric_details = {}
+        self._summary_json = {}
+        self._detail_json = {}
+        self._entity_json = {}
+        self._json_layout = None
+        self._metric_layout = None
+
+    @classmethod
+    def load(cls, kind):
+        start = time.perf_counter()
+        engine = cls(kind)
+        engine.version = dataset_fingerprint(kind)
+        engine._load_entities()
+        engine._load_metrics()
+        engine._load_matches()
+        loaded = time.perf_counter()
+        observe_engine(kind, "load", loaded - start)
+        if SQL_NORMALIZE:
+            engine._normalise_in_sql()
+        else:
+            engine._normalise()
+        engine._build()
+        observe_engine(kind, "normalize", time.perf_counter() - loaded)
+        return engine
+
+    def _load_entities(self):
+        if self.kind == COUNTRY:
+            rows = db.session.query(
+                Country.id, Country.name, Country.region, Country.country_code
+            ).all()
+            for row in rows:
+                self.entities.append({
+                    "country_id": row.id,
+                    "country_name": row.name,
+                    "region": row.region,
+                    "country_code": row.country_code,
+                })
+        else:
+            countries = {
+                row.id: row
+                for row in db.session.query(Country.id, Country.name, Country.region).all()
+            }
+            rows = db.session.query(
+                University.id, University.name, University.country_id, University.city
+            ).all()
+            for row in rows:
+                country = countries.get(row.country_id)
+                self.entities.append({
+                    "university_id": row.id,
+                    "university_name": row.name,
+                    "country_id": row.country_id,
+                    "country_name": country.name if country else "Unknown",
+                    "city": row.city,
+                    "region": country.region if country else "Unknown",
+                })
+
+        id_key = "country_id" if self.kind == COUNTRY else "university_id"
+        self.entity_index = {e[id_key]: i for i, e in enumerate(self.entities)}
+
+    def _load_metrics(self):
+        metric_groups = MetricGroup.query.filter(MetricGroup.category.in_([self.kind, "both"])).all()
+        group_ids = [mg.id for mg in metric_groups]
+        metrics = Metric.query.filter(Metric.group_id.in_(group_ids)).all()
+        self.all_group_ids = group_ids
+
+        positive = []
+        for mg in metric_groups:
+            in_group = [m for m in metrics if m.group_id == mg.id]
+            if not in_group:
+                continue
+            self.group_ids.append(mg.id)
+            self.group_names.append(mg.name)
+            self.group_metrics.append(
+                list(range(len(self.metric_ids), len(self.metric_ids) + len(in_group)))
+            )
+            self.metric_ids.extend(m.id for m in in_group)
+            self.metric_names.extend(m.name for m in in_group)
+            positive.extend(bool(m.is_positive) for m in in_group)
+
+        self.metric_positive = np.array(positive, dtype=bool)
+
+    def _load_matches(self):
+        if self.kind == COUNTRY:
+            discipline_map = {
+                row.country: list(row.top_disciplines)
+                for row in CountryDisciplines.query.all()
+            }
+            industry_map = {
+                row.country: list(row.dominant_industries)
+                for row in CountryIndustry.query.all()
+            }
+            self.discipline_index = _inverted_index(discipline_map.get(e["country_name"], []) for e in self.entities)
+            self.industry_index = _inverted_index(industry_map.get(e["country_name"], []) for e in self.entities)
+        else:
+            discipline_map = {
+                row.uni_id: list(row.top_disciplines)
+                for row in UniversityDisciplines.query.all()
+            }
+            self.discipline_index = _inverted_index(discipline_map.get(e["university_id"], []) for e in self.entities)
+            self.industry_index = {}
+
+    def _normalise(self):
+        n_metrics = len(self.metric_ids)
+        metric_col = {metric_id: j for j, metric_id in enumerate(self.metric_ids)}
+        rows = []
+        if self.metric_ids:
+            table = _metric_table(self.kind)
+            rows = db.session.execute(
+                select(_entity_column(self.kind), table.c.metric_id, table.c.raw_value)
+                .where(table.c.metric_id.in_(self.metric_ids))
+            ).fetchall()
+
+        # Log-normalise each metric over every stored value (0-100), NaN where missing
+        log_values = np.full((len(self.entities), n_metrics), np.nan)
+        log_min = np.zeros(n_metrics)
+        log_max = np.ones(n_metrics)
+        per_metric = [[] for _ in range(n_metrics)]
+        for entity_id, metric_id, raw_value in rows:
+            if raw_value is None:
+                continue
+            per_metric[metric_col[metric_id]].append((entity_id, math.log(raw_value + 1)))
+
+        for j, values in enumerate(per_metric):
+            if not values:
+                continue
+            logs = [v for _, v in values]
+            log_min[j], log_max[j] = min(logs), max(logs)
+            for entity_id, log_value in values:
+                i = self.entity_index.get(entity_id)
+                if i is not None:
+                    log_values[i, j] = log_value
+
+        log_range = log_max - log_min
+        self.metric_flat = ~(log_range > 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            normalised = (log_values - log_min) / np.where(self.metric_flat, 1, log_range) * 100
+        normalised = np.where(self.metric_flat, 50.0, normalised)
+        normalised = np.where(self.metric_positive, normalised, 100 - normalised)
+        normalised[np.isnan(log_values)] = np.nan
+        self.normalised = normalised
+
+        # Kept for with_updates; counts include values of entities not loaded
+        self.log_values = log_values
+        self.log_min = log_min
+        self.log_max = log_max
+        self.metric_counts = np.array([len(values) for values in per_metric], dtype=np.int64)
+
+    def _normalise_in_sql(self):
+        n_metrics = len(self.metric_ids)
+        metric_col = {metric_id: j for j, metric_id in enumerate(self.metric_ids)}
+        normalised = np.full((len(self.entities), n_metrics), np.nan)
+        self.metric_flat = np.zeros(n_metrics, dtype=bool)
+        if not self.metric_ids:
+            self.normalised = normalised
+            return
+
+        table = _metric_table(self.kind)
+        log_value = func.ln(table.c.raw_value + 1)
+        min_log = func.min(log_value).over(partition_by=table.c.metric_id)
+        max_log = func.max(log_value).over(partition_by=table.c.metric_id)
+        scaled = case(
+            (max_log - min_log > 0, (log_value - min_log) / (max_log - min_log) * 100),
+            else_=50.0,
+        )
+        score = case((Metric.is_positive, scaled), else_=100 - scaled)
+
+        rows = db.session.execute(
+            select(_entity_column(self.kind), table.c.metric_id, score)
+            .join(Metric, Metric.id == table.c.metric_id)
+            .where(table.c.metric_id.in_(self.metric_ids), table.c.raw_value.isnot(None))
+        ).fetchall()
+
+        for entity_id, metric_id, value in rows:
+            i = self.entity_index.get(entity_id)
+            if i is not None:
+                normalised[i, metric_col[metric_id]] = value
+
+        # A metric with any spread always has a 0 and a 100, so "every value
+        # is 50" identifies the flat ones
+        present = ~np.isnan(normalised)
+        self.metric_flat = present.any(axis=0) & np.all(np.where(present, normalised == 50, True), axis=0)
+        self.normalised = normalised
+
+    def _build(self):
+        n_entities = len(self.entities)
+        normalised = self.normalised
+
+        # Average each group's metrics, then min-max the group across entities
+        n_groups = len(self.group_ids)
+        present = ~np.isnan(normalised)
+        self.raw_group = np.zeros((n_entities, n_groups))
+        group_present = np.zeros((n_entities, n_groups), dtype=bool)
+        for g, cols in enumerate(self.group_metrics):
+            metric_weight = 1 / len(cols)
+            for j in cols:
+                self.raw_group[:, g] += np.where(present[:, j], normalised[:, j] * metric_weight, 0.0)
+                group_present[:, g] |= present[:, j]
+        self.group_present = group_present
+        self._scale_groups()
+
+    def _scale_groups(self):
+        n_entities, n_groups = self.raw_group.shape
+        self._summary_json = {}
+        self._detail_json = {}
+        group_present = self.group_present
+
+        group_scores = np.full((n_entities, n_groups), 50.0)
+        self.group_flat = np.ones(n_groups, dtype=bool)
+        if n_entities:
+            min_s = self.raw_group.min(axis=0)
+            max_s = self.raw_group.max(axis=0)
+            self.group_min, self.group_max = min_s, max_s
+            self.group_flat = ~(max_s > min_s)
+            for g in range(n_groups):
+                if not self.group_flat[g]:
+                    group_scores[:, g] = (self.raw_group[:, g] - min_s[g]) / (max_s[g] - min_s[g]) * 100
+
+        # Python-rounded copies, so the JSON matches the float/int values the
+        # loop implementation produced
+        self._raw_group_py = [
+            [value if has else 0 for value, has in zip(row, has_row)]
+            for row, has_row in zip(self.raw_group.tolist(), group_present.tolist())
+        ]
+        self._group_score_py = [
+            [50 if self.group_flat[g] else round(value, 2) for g, value in enumerate(row)]
+            for row in group_scores.tolist()
+        ]
+        self.group_scores = np.array(self._group_score_py, dtype=float).reshape(n_entities, n_groups)
+
+    def with_updates(self, updates):
+        """A copy of the engine with (entity_id, metric_id, raw_value) changes applied.
+
+        ``raw_value`` None means the value was removed. Returns None when a
+        change moves a metric's log min/max, or touches an entity or metric
+        this engine did not load; the engine then has to be reloaded. Group
+        min/max shifts are rescaled in memory.
+        """
+        if self.log_values is None:
+            return None
+
+        metric_col = {metric_id: j for j, metric_id in enumerate(self.metric_ids)}
+        engine = copy.copy(self)
+        engine.log_values = self.log_values.copy()
+        engine.normalised = self.normalised.copy()
+        engine.metric_counts = self.metric_counts.copy()
+        engine._metric_details = dict(self._metric_details)
+        engine._summary_json = dict(self._summary_json)
+        engine._detail_json = dict(self._detail_json)
+
+        touched = set()
+        for entity_id, metric_id, raw_value in updates:
+            i = self.entity_index.get(entity_id)
+            j = metric_col.get(metric_id)
+            if i is None or j is None:
+                return None
+            old = engine.log_values[i, j]
+            new = math.log(raw_value + 1) if raw_value is not None else math.nan
+            if not engine._keeps_log_range(j, old, new):
+                return None
+
+            engine.log_values[i, j] = new
+            engine.metric_counts[j] += int(new == new) - int(old == old)
+            engine.normalised[i, j] = engine._normalise_value(j, new)
+            engine._metric_details.pop(i, None)
+            engine._summary_json.pop(i, None)
+            engine._detail_json.pop(i, None)
+            touched.add(i)
+
+        if touched:
+            engine._rescore_rows(sorted(touched))
+        return engine
+
+    def _keeps_log_range(self, j, old, new):
+        low, high = self.log_min[j], self.log_max[j]
+        if self.metric_counts[j] == 0:
+            return False
+        if new == new and (new < low or new > high):
+            return False
+        if old == old and old != new and (old == low or old == high):
+            # Still the extremum if another entity holds the same value
+            return np.count_nonzero(self.log_values[:, j] == old) > 1
+        return True
+
+    def _normalise_value(self, j, log_value):
+        if log_value != log_value:
+            return np.nan
+        if self.metric_flat[j]:
+            value = 50.0
+        else:
+            value = (log_value - self.log_min[j]) / (self.log_max[j] - self.log_min[j]) * 100
+        return value if self.metric_positive[j] else 100 - value
+
+    def _rescore_rows(self, rows):
+        self.raw_group = self.raw_group.copy()
+        self.group_present = self.group_present.copy()
+        for i in rows:
+            for g, cols in enumerate(self.group_metrics):
+                # Same order of additions as _build
+                metric_weight = 1 / len(cols)
+                raw = 0.0
+                for j in cols:
+                    value = self.normalised[i, j]
+                    raw += value * metric_weight if value == value else 0.0
+                self.raw_group[i, g] = raw
+                self.group_present[i, g] = any(self.normalised[i, j] == self.normalised[i, j] for j in cols)
+
+        min_s = self.raw_group.min(axis=0)
+        max_s = self.raw_group.max(axis=0)
+        if not (np.array_equal(min_s, self.group_min) and np.array_equal(max_s, self.group_max)):
+            self._scale_groups()
+            return
+
+        self._raw_group_py = list(self._raw_group_py)
+        self._group_score_py = list(self._group_score_py)
+        self.group_scores = self.group_scores.copy()
+        for i in rows:
+            raw_row = self.raw_group[i].tolist()
+            self._raw_group_py[i] = [
+                value if has else 0 for value, has in zip(raw_row, self.group_present[i].tolist())
+            ]
+            self._group_score_py[i] = [
+                50 if self.group_flat[g] else round(((self.raw_group[i, g] - min_s[g]) / (max_s[g] - min_s[g]) * 100).item(), 2)
+                for g in range(len(self.group_ids))
+            ]
+            self.group_scores[i] = self._group_score_py[i]
+
+    def _build_metric_details(self, i):
+        row = self.normalised[i].tolist()
+        return [
+            {
+                self.metric_names[j]: 50 if self.metric_flat[j] else round(row[j], 2)
+                for j in cols
+                if row[j] == row[j]
+            }
+            for cols in self.group_metrics
+        ]
+
+    def metric_details(self, i):
+        details = self._metric_details.get(i)
+        if details is None:
+            details = self._build_metric_details(i)
+            if len(self._metric_details) < JSON_DETAIL_CACHE_ENTITIES:
+                self._metric_details[i] = details
+        return details
+
+    def group_json(self, i, detail=True):
+        """``"groups":{...}`` JSON with a ``{}`` format field for each group's weighted score.
+
+        Groups are sorted by name. Nothing here depends on the weights, so
+        summary templates are cached for every entity and full-detail ones
+        for the first JSON_DETAIL_CACHE_ENTITIES entities asked for.
+        """
+        cache = self._detail_json if detail else self._summary_json
+        template = cache.get(i)
+        if template is None:
+            metrics = self.metric_json(i) if detail else None
+            raw_row = self._raw_group_py[i]
+            score_row = self._group_score_py[i]
+            _, groups = self.json_layout()
+            # json.dumps writes ints and floats with repr()
+            parts = [
+                _format_escape(f'{prefix}{score_row[g]!r},"group_score_weighted":')
+                + "{}"
+                + _format_escape(
+                    (f',"metrics":{metrics[g]}' if detail else "") + f',"raw_group_score":{raw_row[g]!r}}}'
+                )
+                for g, prefix in groups
+            ]
+            template = '"groups":{{' + ",".join(parts) + "}}"
+            if not detail or len(cache) < JSON_DETAIL_CACHE_ENTITIES:
+                cache[i] = template
+        return template
+
+    def metric_json(self, i):
+        """Each group's ``metrics`` map for entity ``i`` as JSON, without building the dicts."""
+        row = round2(self.normalised[i])
+        present = (row == row).tolist()
+        # Normalised values are 0-100, so the repr of every rounded value is in _CENT_TEXT
+        cents = np.rint(np.where(present, row, 0) * 100)
+        if cents.min(initial=0) < 0 or cents.max(initial=0) >= len(_CENT_TEXT):
+            texts = [repr(v) for v in row.tolist()]
+        else:
+            texts = _CENT_TEXT[cents.astype(np.intp)].tolist()
+        return [
+            "{" + ",".join([key + ("50" if flat else texts[j]) for j, key, flat in cols if present[j]]) + "}"
+            for cols in self.metric_layout()
+        ]
+
+    def metric_layout(self):
+        """Per group, (column, ``"name":`` prefix, flat) for its metrics in key order."""
+        if self._metric_layout is None:
+            self._metric_layout = [
+                [
+                    (j, dumps(self.metric_names[j]) + ":", bool(self.metric_flat[j]))
+                    for j in sorted(cols, key=lambda j: self.metric_names[j])
+                ]
+                for cols in self.group_metrics
+            ]
+        return self._metric_layout
+
+    def entity_json(self, i):
+        """``"key":value`` fragments of the entity fields of result ``i``."""
+        fragments = self._entity_json.get(i)
+        if fragments is None:
+            fragments = self._entity_json[i] = {
+                key: f"{dumps(key)}:{dumps(value)}" for key, value in self.entities[i].items()
+            }
+        return fragments
+
+    def json_layout(self):
+        """(sorted result keys, groups sorted by name with their key prefixes)."""
+        if self._json_layout is None:
+            keys = set(self.entities[0]) if self.entities else set()
+            keys |= {"overall_score", "discipline_score", "final_score", "groups"}
+            if self.kind == COUNTRY:
+                keys.add("industry_score")
+            groups = sorted(range(len(self.group_names)), key=lambda g: self.group_names[g])
+            self._json_layout = (
+                sorted(keys),
+                [(g, dumps(self.group_names[g]) + ':{"group_score":') for g in groups],
+            )
+        return self._json_layout
+
+    def weight_vector(self, group_weights):
+        if group_weights is None:
+            total_groups = len(self.all_group_ids)
+            group_weights = {gid: 1.0 / total_groups for gid in self.all_group_ids}
+        return [group_weights.get(gid, 0) for gid in self.group_ids]
+
+    def score(self, group_weights=None, selected_disciplines=None, selected_industries=None):
+        start = time.perf_counter()
+        ranking = Ranking(self, self.weight_vector(group_weights), selected_disciplines, selected_industries)
+        observe_engine(self.kind, "score", time.perf_counter() - start)
+        return ranking
+
+    def score_many(self, scenarios):
+        """Score (group_weights, selected_disciplines, selected_industries) tuples in one pass."""
+        start = time.perf_counter()
+        vectors = [self.weight_vector(weights) for weights, _, _ in scenarios]
+        matrix = np.array(vectors, dtype=float).reshape(len(vectors), len(self.group_ids)).T
+        totals = weighted_totals_many(self.group_scores, matrix)
+        rankings = [
+            Ranking(self, vector, disciplines, industries, totals=totals[:, k])
+            for k, (vector, (_, disciplines, industries)) in enumerate(zip(vectors, scenarios))
+        ]
+        observe_engine(self.kind, "score", time.perf_counter() - start)
+        return rankings
+
+
+def weighted_totals(group_scores, weights):
+    # Accumulate group by group so the float sums match a sequential loop exactly
+    totals = np.zeros(group_scores.shape[0])
+    for g, weight in enumerate(weights):
+        totals += group_scores[:, g] * weight
+    return totals
+
+
+def weighted_totals_many(group_scores, weight_matrix):
+    # (entities x groups) @ (groups x scenarios), accumulated the same way as
+    # weighted_totals so every column matches scoring that scenario alone
+    totals = np.zeros((group_scores.shape[0], weight_matrix.shape[1]))
+    for g in range(weight_matrix.shape[0]):
+        totals += group_scores[:, g:g + 1] * weight_matrix[g]
+    return totals
+
+
+def final_weights(kind, selected_disciplines=None, selected_industries=None):
+    """(overall, discipline, industry) weights of the final score."""
+    has_disciplines = bool(selected_disciplines and len(selected_disciplines) > 0)
+    has_industries = bool(selected_industries and len(selected_industries) > 0)
+
+    if kind != COUNTRY:
+        return (0.8, 0.2, 0.0) if has_disciplines else (1.0, 0.0, 0.0)
+    if not has_disciplines and not has_industries:
+        return 1.0, 0.0, 0.0
+    if has_disciplines and not has_industries:
+        return 0.8, 0.2, 0.0
+    if not has_disciplines and has_industries:
+        return 0.8, 0.0, 0.2
+    return 0.8, 0.1, 0.1
+
+
+class Ranking:
+    def __init__(self, engine, weights, selected_disciplines=None, selected_industries=None, totals=None):
+        self.engine = engine
+        self.weights = weights
+        n_entities = len(engine.entities)
+
+        self.total_is_int = all(
+            engine.group_flat[g] and isinstance(w, int) for g, w in enumerate(weights)
+        )
+        self.totals = weighted_totals(engine.group_scores, weights) if totals is None else totals
+
+        self.discipline_scores = [0] * n_entities
+        if selected_disciplines:
+            self.discipline_scores = _match_scores(engine.discipline_index, selected_disciplines, n_entities)
+        self.industry_scores = [0] * n_entities
+        if selected_industries:
+            self.industry_scores = _match_scores(engine.industry_index, selected_industries, n_entities)
+
+        overall_weight, discipline_weight, industry_weight = final_weights(
+            engine.kind, selected_disciplines, selected_industries
+        )
+        if engine.kind == COUNTRY:
+            final = (
+                self.totals * overall_weight
+                + np.array(self.discipline_scores, dtype=float) * discipline_weight
+                + np.array(self.industry_scores, dtype=float) * industry_weight
+            )
+        else:
+            final = self.totals * overall_weight + np.array(self.discipline_scores, dtype=float) * discipline_weight
+
+        self.final_scores = [round(value, 2) for value in final.tolist()]
+        self._final = np.array(self.final_scores, dtype=float)
+        self._order = None
+
+    def __len__(self):
+        return len(self.final_scores)
+
+    @property
+    def order(self):
+        # Stable descending sort on the rounded score, ties keep load order
+        if self._order is None:
+            self._order = np.argsort(-self._final, kind="stable")
+        return self._order
+
+    def top(self, offset=0, limit=None):
+        n = len(self._final)
+        if limit is None or self._order is not None or offset + limit >= n:
+            end = None if limit is None else offset + limit
+            return self.order[offset:end]
+
+        # Partition out everything scoring at least the k-th best, then sort
+        # only that slice; candidates stay in index order so ties match the
+        # full stable sort
+        k = offset + limit
+        if k == 0:
+            return self.order[:0]
+        kth = -np.partition(-self._final, k - 1)[k - 1]
+        candidates = np.flatnonzero(self._final >= kth)
+        ordered = candidates[np.argsort(-self._final[candidates], kind="stable")]
+        return ordered[offset:k]
+
+    def entity_result(self, i, detail=True):
+        engine = self.engine
+        total = int(self.totals[i]) if self.total_is_int else float(self.totals[i])
+        raw_row = engine._raw_group_py[i]
+        score_row = engine._group_score_py[i]
+        details = engine.metric_details(i) if detail else None
+
+        groups = {}
+        for g, name in enumerate(engine.group_names):
+            group_score = score_row[g]
+            groups[name] = {
+                "raw_group_score": raw_row[g],
+                "group_score": group_score,
+                "group_score_weighted": round(group_score * self.weights[g], 2),
+            }
+            if detail:
+                groups[name]["metrics"] = details[g]
+
+        result = dict(engine.entities[i])
+        result["overall_score"] = round(total, 2)
+        result["discipline_score"] = round(self.discipline_scores[i], 2)
+        if engine.kind == COUNTRY:
+            result["industry_score"] = round(self.industry_scores[i], 2)
+        result["final_score"] = self.final_scores[i]
+        result["groups"] = groups
+        return result
+
+    def results(self, offset=0, limit=None, fields="full"):
+        start = time.perf_counter()
+        detail = fields != "summary"
+        results = [self.entity_result(i, detail) for i in self.top(offset, limit).tolist()]
+        observe_engine(self.engine.kind, "serialize", time.perf_counter() - start)
+        return results
+
+    def entity_json(self, i, detail=True):
+        """``entity_result(i, detail)`` as JSON text, assembled from cached fragments."""
+        engine = self.engine
+        total = int(self.totals[i]) if self.total_is_int else float(self.totals[i])
+        score_row = engine._group_score_py[i]
+        keys, groups = engine.json_layout()
+        weights = self.weights
+        weighted = [repr(round(score_row[g] * weights[g], 2)) for g, _ in groups]
+
+        fields = dict(engine.entity_json(i))
+        fields["overall_score"] = f'"overall_score":{round(total, 2)!r}'
+        fields["discipline_score"] = f'"discipline_score":{round(self.discipline_scores[i], 2)!r}'
+        if engine.kind == COUNTRY:
+            fields["industry_score"] = f'"industry_score":{round(self.industry_scores[i], 2)!r}'
+        fields["final_score"] = f'"final_score":{self.final_scores[i]!r}'
+        fields["groups"] = engine.group_json(i, detail).format(*weighted)
+        return "{" + ",".join(fields[key] for key in keys) + "}"
+
+    def json_chunks(self, offset=0, limit=None, fields="full", chunk_bytes=JSON_CHUNK_BYTES):
+        """Yield ``results(offset, limit, fields)`` as a JSON array, in byte chunks."""
+        # Only time spent building chunks counts, not the consumer sending them
+        elapsed, start = 0.0, time.perf_counter()
+        detail = fields != "summary"
+        buffer, size = ["["], 1
+        for n, i in enumerate(self.top(offset, limit).tolist()):
+            item = self.entity_json(i, detail)
+            buffer.append("," + item if n else item)
+            size += len(item) + 1
+            if size >= chunk_bytes:
+                elapsed += time.perf_counter() - start
+                yield "".join(buffer).encode()
+                start = time.perf_counter()
+                buffer, size = [], 0
+        buffer.append("]")
+        observe_engine(self.engine.kind, "serialize", elapsed + time.perf_counter() - start)
+        yield "".join(buffer).encode()
+
+
+_engines = {}
+# Guards _engines only; fingerprints and loads run outside it
+_engines_lock = threading.Lock()
+# One version check or rebuild per kind at a time. Other requests keep
+# serving the current engine meanwhile
+_refresh_locks = {COUNTRY: threading.Lock(), UNIVERSITY: threading.Lock()}
+
+
+def get_engine(kind):
+    with _engines_lock:
+        cached = _engines.get(kind)
+    now = time.monotonic()
+    if cached and now - cached["checked_at"] < VERSION_CHECK_SECONDS and now - cached["built_at"] < REBUILD_SECONDS:
+        return cached["engine"]
+
+    # Only the first load, with nothing to serve yet, makes requests wait
+    refresh = _refresh_locks[kind]
+    if not refresh.acquire(blocking=cached is None):
+        return cached["engine"]
+    try:
+        with _engines_lock:
+            cached = _engines.get(kind)
+        now = time.monotonic()
+        if cached and now - cached["built_at"] < REBUILD_SECONDS:
+            if now - cached["checked_at"] < VERSION_CHECK_SECONDS:
+                # Refreshed by the thread this one waited for
+                return cached["engine"]
+            if dataset_fingerprint(kind) == cached["engine"].version:
+                cached["checked_at"] = time.monotonic()
+                return cached["engine"]
+
+        engine = ScoringEngine.load(kind)
+        now = time.monotonic()
+        with _engines_lock:
+            # A metric update or invalidate() during the load wins
+            if _engines.get(kind) is cached:
+                _engines[kind] = {"engine": engine, "checked_at": now, "built_at": now}
+        return engine
+    finally:
+        refresh.release()
+
+
+def apply_metric_updates(kind, updates, expected_version):
+    """Fold committed metric value changes into the cached engine for ``kind``.
+
+    ``expected_version`` is the dataset fingerprint from before the write; if
+    the cached engine was built from anything else it is dropped instead.
+    Returns True when the engine was updated in place.
+    """
+    version = dataset_fingerprint(kind)
+    with _engines_lock:
+        cached = _engines.get(kind)
+        engine = None
+        if cached and cached["engine"].version == expected_version:
+            engine = cached["engine"].with_updates(updates)
+        if engine is None:
+            _engines.pop(kind, None)
+            return False
+
+        engine.version = version
+        _engines[kind] = {"engine": engine, "checked_at": time.monotonic(), "built_at": cached["built_at"]}
+        return True
+
+
+def invalidate(kind=None):
+    with _engines_lock:
+        if kind is None:
+            _engines.clear()
+        else:
+            _engines.pop(kind, None)
@@ -0,0 +1,122 @@
+import itertools
+import math
+import os
+
+import numpy as np
+
+from scoring import COUNTRY, final_weights, round2, weighted_totals_many
+
+MAX_SAMPLES = int(os.getenv("SENSITIVITY_MAX_SAMPLES", "2000"))
+# Upper bound on entities x samples, which is the size of the rank matrix
+MAX_CELLS = int(os.getenv("SENSITIVITY_MAX_CELLS", "20000000"))
+# Scenarios are scored this many entity x scenario cells at a time
+CHUNK_CELLS = 2_000_000
+
+METHODS = ("random", "grid")
+ID_FIELDS = {
+    COUNTRY: ("country_id", "country_name"),
+    "uni": ("university_id", "university_name"),
+}
+
+
+def perturbed_weights(base, radius, samples, method="random", seed=None):
+    """Weight vectors near ``base``, one per column of a (groups x samples) matrix.
+
+    Each group's weight moves by at most ``radius``, is clipped at zero and the
+    vector is rescaled to the base vector's sum, so every sample stays on the
+    same weight simplex. ``grid`` takes every combination of -radius, 0 and
+    +radius instead of random offsets.
+    """
+    base = np.asarray(base, dtype=float)
+    total = base.sum()
+    if total <= 0:
+        raise ValueError("weights must have a positive sum")
+
+    if method == "grid":
+        if 3 ** len(base) > samples:
+            raise ValueError(f"grid needs {3 ** len(base)} samples for {len(base)} groups; raise samples or use random")
+        offsets = np.array(list(itertools.product((-radius, 0.0, radius), repeat=len(base)))).T
+    else:
+        rng = np.random.default_rng(seed)
+        offsets = rng.uniform(-radius, radius, size=(len(base), samples))
+
+    weights = np.clip(base[:, None] + offsets, 0, None)
+    sums = weights.sum(axis=0)
+    # A sample clipped to all zeros falls back to the base vector
+    weights[:, sums == 0] = base[:, None]
+    sums[sums == 0] = total
+    return weights * (total / sums)
+
+
+def rank_columns(final):
+    """1-based rank of every entity in each column, ties in load order."""
+    order = np.argsort(-final, axis=0, kind="stable")
+    ranks = np.empty(final.shape, dtype=np.int32)
+    positions = np.arange(1, final.shape[0] + 1, dtype=np.int32)[:, None]
+    np.put_along_axis(ranks, order, np.broadcast_to(positions, final.shape), axis=0)
+    return ranks
+
+
+def sensitivity(engine, group_weights, radius, samples=500, top_k=10, method="random",
+                selected_disciplines=None, selected_industries=None, seed=None):
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    if not math.isfinite(radius) or radius < 0:
+        raise ValueError("radius must be a finite non-negative number")
+    if not 0 < samples <= MAX_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+
+    n_entities = len(engine.entities)
+    base_ranking = engine.score(group_weights, selected_disciplines, selected_industries)
+    weights = perturbed_weights(base_ranking.weights, radius, samples, method, seed)
+    n_samples = weights.shape[1]
+    if n_entities * n_samples > MAX_CELLS:
+        raise ValueError(f"{n_entities} entities x {n_samples} samples is over the {MAX_CELLS} cell limit")
+
+    overall_weight, discipline_weight, industry_weight = final_weights(
+        engine.kind, selected_disciplines, selected_industries
+    )
+    # Added term by term in Ranking's order, so the float sums match it exactly
+    bonuses = [np.array(base_ranking.discipline_scores, dtype=float)[:, None] * discipline_weight]
+    if engine.kind == COUNTRY:
+        bonuses.append(np.array(base_ranking.industry_scores, dtype=float)[:, None] * industry_weight)
+
+    ranks = np.empty((n_entities, n_samples), dtype=np.int32)
+    chunk = max(1, CHUNK_CELLS // max(n_entities, 1))
+    for start in range(0, n_samples, chunk):
+        columns = weights[:, start:start + chunk]
+        # Rankings sort on the final score rounded to 2 places; do the same
+        final = weighted_totals_many(engine.group_scores, columns) * overall_weight
+        for bonus in bonuses:
+            final = final + bonus
+        ranks[:, start:start + chunk] = rank_columns(round2(final))
+
+    base_ranks = np.empty(n_entities, dtype=np.int64)
+    base_ranks[base_ranking.order] = np.arange(1, n_entities + 1)
+    min_ranks = ranks.min(axis=1).tolist()
+    max_ranks = ranks.max(axis=1).tolist()
+    median_ranks = np.median(ranks, axis=1).tolist()
+    top_k_frequency = ((ranks <= top_k).sum(axis=1) / n_samples).tolist()
+
+    id_field, name_field = ID_FIELDS[engine.kind]
+    results = []
+    for i in base_ranking.order.tolist():
+        entity = engine.entities[i]
+        results.append({
+            id_field: entity[id_field],
+            name_field: entity[name_field],
+            "base_rank": int(base_ranks[i]),
+            "min_rank": min_ranks[i],
+            "max_rank": max_ranks[i],
+            "median_rank": median_ranks[i],
+            "top_k_frequency": round(top_k_frequency[i], 4),
+        })
+
+    return {
+        "weights": dict(zip(engine.group_ids, base_ranking.weights)),
+        "radius": radius,
+        "method": method,
+        "samples": n_samples,
+        "top_k": top_k,
+        "results": results,
+    }
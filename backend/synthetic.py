@@ -0,0 +1,233 @@
+"""Fill the models.py schema with a synthetic dataset for benchmarking.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/path_bench \
+        python synthetic.py --countries 60 --universities 50000 --metrics-per-group 40 --reset
+
+The target database is taken from --database-url or BENCH_DATABASE_URL only,
+never DATABASE_URL, and --reset drops and recreates every table in it.
+"""
+import argparse
+import io
+import math
+import os
+import random
+import sys
+
+DISCIPLINE_WORDS = [
+    "Engineering", "Medicine", "Law", "Business", "Computer Science", "Physics",
+    "Chemistry", "Biology", "Economics", "Psychology", "Architecture", "Nursing",
+    "Education", "History", "Philosophy", "Mathematics", "Design", "Music",
+    "Agriculture", "Pharmacy", "Data Science", "Finance", "Marketing", "Media",
+]
+INDUSTRY_WORDS = [
+    "Finance", "Technology", "Manufacturing", "Tourism", "Energy", "Mining",
+    "Healthcare", "Agriculture", "Logistics", "Retail", "Construction", "Telecoms",
+]
+REGIONS = ["Europe", "Asia", "North America", "Oceania", "South America", "Africa"]
+
+
+def vocabulary(words, size):
+    if size <= len(words):
+        return words[:size]
+    return words + [f"{words[i % len(words)]} {i // len(words) + 1}" for i in range(len(words), size)]
+
+
+def copy_rows(conn, table, columns, rows):
+    """Bulk-load rows with COPY on Postgres, executemany elsewhere."""
+    if conn.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(str(v) for v in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", buffer)
+        return
+    conn.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+def generate(
+    countries=30,
+    universities=1000,
+    groups=6,
+    metrics_per_group=5,
+    sparsity=0.1,
+    disciplines=24,
+    industries=12,
+    top_n=5,
+    seed=0,
+):
+    """Replace the contents of the current app's database with a synthetic dataset.
+
+    Must run inside an app context. ``sparsity`` is the fraction of
+    entity x metric values left missing.
+    """
+    from sqlalchemy import text
+
+    from models import (
+        db,
+        Country,
+        University,
+        Metric,
+        MetricGroup,
+        country_metrics,
+        university_metrics,
+        CountryIndustry,
+        CountryDisciplines,
+        UniversityDisciplines,
+    )
+
+    rnd = random.Random(seed)
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+    categories = ["country", "uni", "both"]
+    group_rows = [
+        {"id": g + 1, "name": f"Group {g + 1}", "description": None, "category": categories[g % 3]}
+        for g in range(groups)
+    ]
+    metric_rows = []
+    for group in group_rows:
+        for m in range(metrics_per_group):
+            metric_rows.append({
+                "id": len(metric_rows) + 1,
+                "name": f"{group['name']} metric {m + 1}",
+                "description": None,
+                "group_id": group["id"],
+                "is_positive": rnd.random() < 0.75,
+                "unit": None,
+            })
+
+    country_rows = [
+        {
+            "id": c + 1,
+            "name": f"Country {c + 1}",
+            "region": REGIONS[c % len(REGIONS)],
+            "country_code": f"{c:03d}"[-3:] if countries <= 1000 else None,
+        }
+        for c in range(countries)
+    ]
+    university_rows = [
+        {"id": u + 1, "name": f"University {u + 1}", "country_id": rnd.randint(1, countries), "city": f"City {u % 500}"}
+        for u in range(universities)
+    ]
+
+    conn = db.session.connection()
+    conn.execute(MetricGroup.__table__.insert(), group_rows)
+    conn.execute(Metric.__table__.insert(), metric_rows)
+    conn.execute(Country.__table__.insert(), country_rows)
+    if university_rows:
+        conn.execute(University.__table__.insert(), university_rows)
+
+    group_category = {g["id"]: g["category"] for g in group_rows}
+
+    def metric_values(entity_count, kind):
+        for metric in metric_rows:
+            if group_category[metric["group_id"]] not in (kind, "both"):
+                continue
+            scale = 10 ** rnd.randint(0, 6)
+            for entity_id in range(1, entity_count + 1):
+                if rnd.random() < sparsity:
+                    continue
+                # Log-normal-ish values, like the real per-capita/price metrics
+                yield entity_id, metric["id"], round(scale * math.exp(rnd.gauss(0, 1)), 4)
+
+    if conn.dialect.name == "postgresql":
+        # Rows were inserted with explicit ids; move the sequences past them
+        for table in (MetricGroup.__table__, Metric.__table__, Country.__table__, University.__table__):
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"GREATEST((SELECT MAX(id) FROM {table.name}), 1))"
+            ))
+
+    copy_rows(conn, country_metrics, ["country_id", "metric_id", "raw_value"], metric_values(countries, "country"))
+    copy_rows(conn, university_metrics, ["university_id", "metric_id", "raw_value"], metric_values(universities, "uni"))
+
+    discipline_names = vocabulary(DISCIPLINE_WORDS, disciplines)
+    industry_names = vocabulary(INDUSTRY_WORDS, industries)
+    top_disciplines = min(top_n, len(discipline_names))
+    top_industries = min(top_n, len(industry_names))
+
+    conn.execute(CountryDisciplines.__table__.insert(), [
+        {"country": c["name"], "top_disciplines": rnd.sample(discipline_names, top_disciplines), "comments": None}
+        for c in country_rows
+    ])
+    conn.execute(CountryIndustry.__table__.insert(), [
+        {
+            "country": c["name"],
+            "dominant_industries": rnd.sample(industry_names, top_industries),
+            "growing_industries": rnd.sample(industry_names, min(2, len(industry_names))),
+            "comments": None,
+        }
+        for c in country_rows
+    ])
+    if university_rows:
+        conn.execute(UniversityDisciplines.__table__.insert(), [
+            {
+                "uni_id": u["id"],
+                "top_disciplines": rnd.sample(discipline_names, top_disciplines),
+                "top_courses": [],
+                "comments": None,
+            }
+            for u in university_rows
+        ])
+    db.session.commit()
+
+    return {
+        "countries": countries,
+        "universities": universities,
+        "groups": groups,
+        "metrics": len(metric_rows),
+        "sparsity": sparsity,
+        "disciplines": disciplines,
+        "industries": industries,
+        "seed": seed,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic rankings dataset.")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--countries", type=int, default=30)
+    parser.add_argument("--universities", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=6)
+    parser.add_argument("--metrics-per-group", type=int, default=5)
+    parser.add_argument("--sparsity", type=float, default=0.1)
+    parser.add_argument("--disciplines", type=int, default=24)
+    parser.add_argument("--industries", type=int, default=12)
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset", action="store_true", help="Required: drops and recreates every table.")
+    return parser.parse_args(argv)
+
+
+def use_database(url):
+    """Point app.py at ``url``; call before anything imports app."""
+    if not url:
+        sys.exit("Set --database-url or BENCH_DATABASE_URL (DATABASE_URL is never used here).")
+    os.environ["DATABASE_URL"] = url
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.reset:
+        sys.exit("Refusing to run without --reset: this drops every table in the target database.")
+    use_database(args.database_url)
+
+    from app import app
+
+    with app.app_context():
+        summary = generate(
+            countries=args.countries,
+            universities=args.universities,
+            groups=args.groups,
+            metrics_per_group=args.metrics_per_group,
+            sparsity=args.sparsity,
+            disciplines=args.disciplines,
+            industries=args.industries,
+            top_n=args.top_n,
+            seed=args.seed,
+        )
+    print(summary)
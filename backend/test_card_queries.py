@@ -0,0 +1,101 @@
+"""Query counts of the Nori card routes against their @query_budget.
+
+Needs a scratch Postgres database (the advisory locks and citation cache are
+Postgres-only): TEST_DATABASE_URL=postgresql://... python -m pytest test_card_queries.py
+The tables are created if missing; only the rows added here are removed.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["QUERY_BUDGET_STRICT"] = "1"
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+import cards  # noqa: E402
+import norry  # noqa: E402
+from app import app  # noqa: E402
+from models import db, Country, CountryDetails, CitationMetadata  # noqa: E402
+
+COUNTRY_NAME = "Query Budget Testland"
+CITATION = "https://example.com/query-budget-testland"
+CARDS = [{"headline": f"Card {i}", "category": "student hacks", "description": "Tip."} for i in range(6)]
+
+
+@pytest.fixture
+def country(monkeypatch):
+    monkeypatch.setattr(norry, "chat_completion", lambda data: {
+        "choices": [{"message": {"content": json.dumps({"cards": CARDS})}}],
+        "citations": [CITATION],
+    })
+    monkeypatch.setattr(norry, "search_citation", lambda url: {"url": url, "title": "Testland", "date": None})
+
+    with app.app_context():
+        db.create_all()
+        record = Country(name=COUNTRY_NAME, region="Test")
+        db.session.add(record)
+        db.session.commit()
+        yield record
+        db.session.rollback()
+        CountryDetails.query.filter_by(country_id=record.id).delete()
+        Country.query.filter_by(id=record.id).delete()
+        CitationMetadata.query.filter_by(url=CITATION).delete()
+        db.session.commit()
+
+
+def add_details(record, age):
+    record.details = CountryDetails(
+        country_id=record.id,
+        country_name=record.name,
+        cards=CARDS,
+        citations=[CITATION],
+        fetch_date=datetime.now() - age,
+    )
+    db.session.commit()
+
+
+def count_queries(path):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", count)
+    try:
+        with app.test_client() as client:
+            response = client.get(path)
+            body = response.get_data(as_text=True)
+    finally:
+        event.remove(Engine, "before_cursor_execute", count)
+    return response, body, statements
+
+
+def budget(endpoint):
+    return app.view_functions[endpoint].query_budget
+
+
+def test_stale_stream_stays_within_budget(country):
+    add_details(country, cards.CARD_TTL + timedelta(hours=1))
+
+    response, body, statements = count_queries(f"/api/country-info/stream?country={COUNTRY_NAME}")
+
+    assert response.status_code == 200
+    events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+    assert events == ["stored", "cards", "citations", "done"]
+    assert len(statements) <= budget("api.country_info_stream"), statements
+
+
+def test_cold_info_stays_within_budget(country):
+    response, body, statements = count_queries(f"/api/country-info?country={COUNTRY_NAME}")
+
+    assert response.status_code == 200
+    assert response.get_json()["source"] == "live"
+    assert len(statements) <= budget("api.country_info"), statements
@@ -16,24 +16,42 @@ function useNorryInfo(uniName) {
     if (!uniName) return;
     setLoading(true);
     setError(null);
-    fetch(`${API_BASE}/uni-info?uni=${encodeURIComponent(uniName)}`)
-      .then((res) => res.json())
-      .then((data) => {
-        if (data.error) {
-          setError(data.error);
-          setCards([]);
-          setSources([]);
-        } else {
-          setCards(data.cards || []);
-          setSources(data.citations || []);
-        }
-      })
-      .catch(() => {
-        setError("Failed to fetch info");
-        setCards([]);
-        setSources([]);
-      })
-      .finally(() => setLoading(false));
+    setCards([]);
+    setSources([]);
+
+    // Stored cards arrive first, then live cards, then enriched citations
+    let received = false;
+    const source = new EventSource(
+      `${API_BASE}/uni-info/stream?uni=${encodeURIComponent(uniName)}`
+    );
+    const showCards = (event) => {
+      const data = JSON.parse(event.data);
+      received = true;
+      setCards(data.cards || []);
+      setLoading(false);
+    };
+    source.addEventListener("stored", (event) => {
+      showCards(event);
+      setSources(JSON.parse(event.data).citations || []);
+    });
+    source.addEventListener("cards", (event) => {
+      showCards(event);
+      setSources([]);
+    });
+    source.addEventListener("citations", (event) => {
+      setSources(JSON.parse(event.data).citations || []);
+    });
+    source.addEventListener("done", () => {
+      source.close();
+      setLoading(false);
+    });
+    source.onerror = () => {
+      source.close();
+      if (!received) setError("Failed to fetch info");
+      setLoading(false);
+    };
+
+    return () => source.close();
   }, [uniName]);
 
   useEffect(() => {
@@ -35,6 +35,9 @@ import {
 // API BASE
 export const API_BASE = "https://path-rankings-backend.onrender.com/api/";
 
+// Bootstrap bundles carry server-relative flag paths; resolve them against the API host
+export const apiUrl = (path) => (path ? new URL(path, API_BASE).href : path);
+
 // Industries
 export const INDUSTRIES = [
   "Energy & Utilities",
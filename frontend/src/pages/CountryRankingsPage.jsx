@@ -3,7 +3,7 @@ import FilterSheetContent from "../components/FilterSection";
 import RankingsTable from "../components/RankingsTable";
 import { History, ListFilter, RefreshCcw, Star } from "lucide-react";
 import CountryInputs from "../components/CountryInputs";
-import { DISCIPLINES, INDUSTRIES, API_BASE, iconMap } from "../data/Data";
+import { DISCIPLINES, INDUSTRIES, API_BASE, apiUrl, iconMap } from "../data/Data";
 import LoadingPage from "../pages/LoadingPage";
 import { RankingsContext } from "../contexts/RankingsContext";
 import PrioritySelector from "@/components/PrioritySelector";
@@ -53,15 +53,10 @@ const RankingsPage = () => {
 
     useEffect(() => {
         setLoading(true);
-        Promise.all([
-            fetch(`${API_BASE}/get-countries`).then((res) => res.json()),
-            fetch(`${API_BASE}/get-regions`).then((res) => res.json()),
-            fetch(`${API_BASE}/get-metric-groups`).then((res) => res.json()),
-            fetch(`${API_BASE}/industries`).then((res) => res.json()),
-            fetch(`${API_BASE}/country-disciplines`).then((res) => res.json()),
-        ])
-            .then(([countriesData, regionData, groupsData, industriesDataResult, disciplinesDataResult]) => {
-                setCountries(countriesData);
+        fetch(`${API_BASE}/bootstrap/country`)
+            .then((res) => res.json())
+            .then(({ countries: countriesData, regions: regionData, metric_groups: groupsData, industries: industriesDataResult, disciplines: disciplinesDataResult }) => {
+                setCountries(countriesData.map((c) => ({ ...c, flag: apiUrl(c.flag) })));
                 setRegions(regionData);
 
                 const filteredGroups = groupsData.filter(
@@ -2,7 +2,7 @@ import { useContext, useEffect, useMemo, useRef } from "react";
 import FilterSheetContent from "../components/FilterSection";
 import RankingsTable from "../components/RankingsTable";
 import { ListFilter, Star } from "lucide-react";
-import { API_BASE, DISCIPLINES } from "../data/Data";
+import { API_BASE, DISCIPLINES, apiUrl } from "../data/Data";
 import LoadingPage from "../pages/LoadingPage";
 import { RankingsContext } from "../contexts/RankingsContext";
 import PrioritySelector from "@/components/PrioritySelector";
@@ -46,17 +46,12 @@ const UniRankingsPage = () => {
 
     useEffect(() => {
         setLoading(true);
-        Promise.all([
-            fetch(`${API_BASE}/get-countries`).then((res) => res.json()),
-            fetch(`${API_BASE}/get-regions`).then((res) => res.json()),
-            fetch(`${API_BASE}/get-universities`).then((res) => res.json()),
-            fetch(`${API_BASE}/get-metric-groups`).then((res) => res.json()),
-            fetch(`${API_BASE}/uni-disciplines`).then((res) => res.json()),
-        ])
-            .then(([countryData, regionData, uniData, groupsData, disciplinesData]) => {
-                setCountries(countryData);
+        fetch(`${API_BASE}/bootstrap/uni`)
+            .then((res) => res.json())
+            .then(({ countries: countryData, regions: regionData, universities: uniData, metric_groups: groupsData, disciplines: disciplinesData }) => {
+                setCountries(countryData.map((c) => ({ ...c, flag: apiUrl(c.flag) })));
                 setRegions(regionData);
-                setUniversities(uniData);
+                setUniversities(uniData.map((u) => ({ ...u, country_flag: apiUrl(u.country_flag) })));
                 setUniDisciplinesData(disciplinesData);
 
                 const filteredGroups = groupsData.filter(